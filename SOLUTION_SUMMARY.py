@@ -10,144 +10,218 @@ This document summarizes the complete implementation of:
 FILES CREATED AND FUNCTIONALITY:
 """
 
-import os
-from datetime import datetime
+import functools
+import operator
+import sys
+
+# Icon shown next to each generated output file, keyed by extension
+OUTPUT_ICONS = {
+    ".pdf": "📄",
+    ".csv": "📊",
+    ".xlsx": "📈",
+    ".html": "🌐",
+}
+
+# Solution files reported in the summary, as (path, description) pairs
+FILES_INFO = (
+    ("app_demo_fixed.py", "Enhanced FastAPI application with CSV generation and PDF conversion"),
+    ("package_manager.py", "Comprehensive PDF/CSV generation utility"),
+    ("demo_files_generator.py", "Sample file generator for testing"),
+    ("convert_html_to_pdf.py", "HTML to PDF conversion utility"),
+    ("document_processor.py", "Real PDF table extraction engine"),
+    ("underwriting_output.py", "Professional Excel report generator"),
+    ("templates/underwriting_template.html", "Industry-standard HTML template"),
+)
+
+# File types served by /api/download/{session_id}/{file_type}
+DOWNLOAD_KINDS = ("excel", "pdf", "html", "rent_roll_csv", "t12_csv", "summary_csv")
+
+# Sort key for DirEntry objects in the output listing
+_BY_NAME = operator.attrgetter("name")
+
+# Bytes-to-KB factor for the output listing
+_INV_1024 = 1.0 / 1024.0
+
+# Horizontal rules used between summary sections
+_RULE30 = "-" * 30
+_RULE60 = "=" * 60
+_RULE30_LINE = (_RULE30 + "\n").encode("utf-8")
+
+# Static sections of the summary; only the file listings are built per call
+_HEADER = f"""\
+🏢 UNDERWRITING APPLICATION - SOLUTION COMPLETE
+{_RULE60}
+
+✅ FEATURES IMPLEMENTED:
+{_RULE30}
+1. PDF Generation from HTML Templates
+   • Multiple PDF generation methods (WeasyPrint, pdfkit, reportlab)
+   • Professional formatting with tables and styling
+   • Landscape orientation for better readability
+   • Fallback methods for Windows compatibility
+
+2. CSV File Generation
+   • Rent roll data extraction to CSV format
+   • T12 financial data extraction to CSV format
+   • Summary extraction reports
+   • Real-time processing from uploaded PDFs
+
+3. Enhanced FastAPI Application
+   • Real PDF processing using DocumentProcessor
+   • Professional Excel generation via UnderwritingOutputGenerator
+   • Multiple download endpoints (Excel, PDF, HTML, CSV)
+   • Background processing with progress tracking
+   • Professional HTML templates matching industry standards
+
+📁 FILES AND COMPONENTS:
+{_RULE30}"""
+
+_MIDDLE = f"""
+🔧 TECHNICAL IMPLEMENTATION:
+{_RULE30}
+• PDF Generation: reportlab (Windows compatible) + WeasyPrint fallback
+• CSV Export: Native Python csv module with real data extraction
+• File Processing: pdfplumber + camelot for table extraction
+• Template System: Dynamic variable substitution in HTML templates
+• Download System: Multiple file type support with proper MIME types
+
+🎯 SOLUTION FOR YOUR REQUIREMENTS:
+{_RULE30}
+1. PDF from HTML: ✅ SOLVED
+   - Created package_manager.py for HTML→PDF conversion
+   - Multiple conversion methods with Windows compatibility
+   - Professional formatting maintained in PDF output
+
+2. CSV Files for T12 & Rent Roll: ✅ SOLVED
+   - Real PDF extraction integrated in FastAPI app
+   - CSV generation added to background processing
+   - Download endpoints updated to support CSV files
+   - Sample CSV files generated for demonstration
+
+🚀 HOW TO USE:
+{_RULE30}
+1. For Existing HTML Files:
+   python package_manager.py
+   (Converts any HTML files in outputs/ to PDF + generates CSV)
+
+2. For New Processing:
+   python app_demo_fixed.py
+   (Start the enhanced web application on http://localhost:8007)
+
+3. Download File Types Available:
+""" + "\n".join(f"   • /api/download/{{session_id}}/{kind}" for kind in DOWNLOAD_KINDS) + "\n"
+
+_FOOTER = f"""\
+🎉 IMPLEMENTATION STATUS: COMPLETE
+{_RULE60}
+
+Your underwriting application now supports:
+✅ Real PDF processing for uploaded documents
+✅ Professional HTML templates
+✅ PDF generation from HTML reports
+✅ CSV extraction for rent roll and T12 data
+✅ Multiple download formats
+✅ Background processing with progress tracking
+
+🔗 Access your application at: http://localhost:8007"""
+
+# Pre-encoded output pieces so the emoji and static text are encoded once at import
+_HEADER_BYTES = (_HEADER + "\n").encode("utf-8")
+_MIDDLE_BYTES = (_MIDDLE + "\n").encode("utf-8")
+_FOOTER_BYTES = (_FOOTER + "\n").encode("utf-8")
+_OUTPUTS_TITLE = "📊 CURRENT OUTPUT FILES:\n".encode("utf-8")
+_CHECK = "✅ ".encode("utf-8")
+_WARN = "⚠️  ".encode("utf-8")
+_BULLET = "•  ".encode("utf-8")
+_DEFAULT_ICON = "📁 ".encode("utf-8")
+_ICON_BYTES = {ext: (icon + " ").encode("utf-8") for ext, icon in OUTPUT_ICONS.items()}
+_FILE_LINES = tuple(
+    (file, (file.ljust(35) + " - " + description + "\n").encode("utf-8"))
+    for file, description in FILES_INFO
+)
+
+def _write_stdout(data):
+    """Write UTF-8 encoded output straight to stdout's binary buffer."""
+    buffer = getattr(sys.stdout, "buffer", None)
+    if buffer is None:
+        # Text-only streams (e.g. io.StringIO) have no binary layer
+        sys.stdout.write(data.decode("utf-8"))
+        return
+    sys.stdout.flush()
+    buffer.write(data)
+    buffer.flush()
+
+def _iter_summary_lines(check_files=True):
+    """Yield the summary as UTF-8 encoded, newline-terminated lines.
+
+    With check_files=False the filesystem is never consulted (and os is never
+    imported): files are listed without a status marker and the current
+    outputs section is skipped.
+    """
+    icons_get = _ICON_BYTES.get
+
+    yield _HEADER_BYTES
+
+    if not check_files:
+        for _, line in _FILE_LINES:
+            yield _BULLET + line
+        yield _MIDDLE_BYTES
+        yield _FOOTER_BYTES
+        return
+
+    import os
+    scandir = os.scandir
+    join = os.path.join
+    splitext = os.path.splitext
+
+    # One directory scan per parent directory instead of a stat per file
+    present = set()
+    for directory in {os.path.dirname(file) for file, _ in FILES_INFO}:
+        try:
+            with scandir(directory or ".") as entries:
+                present.update(join(directory, entry.name) for entry in entries)
+        except FileNotFoundError:
+            pass
+
+    for file, line in _FILE_LINES:
+        yield (_CHECK if file in present else _WARN) + line
+
+    yield _MIDDLE_BYTES
 
-def solution_summary():
-    """Generate a comprehensive summary of the implemented solution."""
-    
-    print("🏢 UNDERWRITING APPLICATION - SOLUTION COMPLETE")
-    print("=" * 60)
-    print()
-    
-    print("✅ FEATURES IMPLEMENTED:")
-    print("-" * 30)
-    print("1. PDF Generation from HTML Templates")
-    print("   • Multiple PDF generation methods (WeasyPrint, pdfkit, reportlab)")
-    print("   • Professional formatting with tables and styling")
-    print("   • Landscape orientation for better readability")
-    print("   • Fallback methods for Windows compatibility")
-    print()
-    
-    print("2. CSV File Generation")
-    print("   • Rent roll data extraction to CSV format")
-    print("   • T12 financial data extraction to CSV format")
-    print("   • Summary extraction reports")
-    print("   • Real-time processing from uploaded PDFs")
-    print()
-    
-    print("3. Enhanced FastAPI Application")
-    print("   • Real PDF processing using DocumentProcessor")
-    print("   • Professional Excel generation via UnderwritingOutputGenerator")
-    print("   • Multiple download endpoints (Excel, PDF, HTML, CSV)")
-    print("   • Background processing with progress tracking")
-    print("   • Professional HTML templates matching industry standards")
-    print()
-    
-    print("📁 FILES AND COMPONENTS:")
-    print("-" * 30)
-    
-    files_info = {
-        "app_demo_fixed.py": "Enhanced FastAPI application with CSV generation and PDF conversion",
-        "package_manager.py": "Comprehensive PDF/CSV generation utility",
-        "demo_files_generator.py": "Sample file generator for testing",
-        "convert_html_to_pdf.py": "HTML to PDF conversion utility",
-        "document_processor.py": "Real PDF table extraction engine",
-        "underwriting_output.py": "Professional Excel report generator",
-        "templates/underwriting_template.html": "Industry-standard HTML template"
-    }
-    
-    for file, description in files_info.items():
-        if os.path.exists(file):
-            print(f"✅ {file:<35} - {description}")
-        else:
-            print(f"⚠️  {file:<35} - {description}")
-    
-    print()
-    print("🔧 TECHNICAL IMPLEMENTATION:")
-    print("-" * 30)
-    print("• PDF Generation: reportlab (Windows compatible) + WeasyPrint fallback")
-    print("• CSV Export: Native Python csv module with real data extraction")
-    print("• File Processing: pdfplumber + camelot for table extraction")
-    print("• Template System: Dynamic variable substitution in HTML templates")
-    print("• Download System: Multiple file type support with proper MIME types")
-    print()
-    
-    print("🎯 SOLUTION FOR YOUR REQUIREMENTS:")
-    print("-" * 30)
-    print("1. PDF from HTML: ✅ SOLVED")
-    print("   - Created package_manager.py for HTML→PDF conversion")
-    print("   - Multiple conversion methods with Windows compatibility")
-    print("   - Professional formatting maintained in PDF output")
-    print()
-    
-    print("2. CSV Files for T12 & Rent Roll: ✅ SOLVED")
-    print("   - Real PDF extraction integrated in FastAPI app")
-    print("   - CSV generation added to background processing")
-    print("   - Download endpoints updated to support CSV files")
-    print("   - Sample CSV files generated for demonstration")
-    print()
-    
-    print("🚀 HOW TO USE:")
-    print("-" * 30)
-    print("1. For Existing HTML Files:")
-    print("   python package_manager.py")
-    print("   (Converts any HTML files in outputs/ to PDF + generates CSV)")
-    print()
-    
-    print("2. For New Processing:")
-    print("   python app_demo_fixed.py")
-    print("   (Start the enhanced web application on http://localhost:8007)")
-    print()
-    
-    print("3. Download File Types Available:")
-    print("   • /api/download/{session_id}/excel")
-    print("   • /api/download/{session_id}/pdf") 
-    print("   • /api/download/{session_id}/html")
-    print("   • /api/download/{session_id}/rent_roll_csv")
-    print("   • /api/download/{session_id}/t12_csv")
-    print("   • /api/download/{session_id}/summary_csv")
-    print()
-    
     # Check current outputs
     outputs_dir = "outputs"
-    if os.path.exists(outputs_dir):
-        files = os.listdir(outputs_dir)
-        if files:
-            print("📊 CURRENT OUTPUT FILES:")
-            print("-" * 30)
-            for file in sorted(files):
-                file_path = os.path.join(outputs_dir, file)
-                size = os.path.getsize(file_path)
-                size_kb = size / 1024
-                
-                if file.endswith('.pdf'):
-                    icon = "📄"
-                elif file.endswith('.csv'):
-                    icon = "📊"
-                elif file.endswith('.xlsx'):
-                    icon = "📈"
-                elif file.endswith('.html'):
-                    icon = "🌐"
-                else:
-                    icon = "📁"
-                
-                print(f"{icon} {file:<45} ({size_kb:.1f} KB)")
-            
-            print()
-    
-    print("🎉 IMPLEMENTATION STATUS: COMPLETE")
-    print("=" * 60)
-    print()
-    print("Your underwriting application now supports:")
-    print("✅ Real PDF processing for uploaded documents")
-    print("✅ Professional HTML templates")
-    print("✅ PDF generation from HTML reports")
-    print("✅ CSV extraction for rent roll and T12 data")
-    print("✅ Multiple download formats")
-    print("✅ Background processing with progress tracking")
-    print()
-    print("🔗 Access your application at: http://localhost:8007")
+    try:
+        it = scandir(outputs_dir)
+    except FileNotFoundError:
+        it = None
+    if it is not None:
+        with it:
+            entries = sorted(it, key=_BY_NAME)
+        if entries:
+            yield _OUTPUTS_TITLE
+            yield _RULE30_LINE
+            for entry in entries:
+                file = entry.name
+                size_kb = entry.stat().st_size * _INV_1024
+                icon = icons_get(splitext(file)[1], _DEFAULT_ICON)
+
+                yield icon + f"{file.ljust(45)} ({size_kb:.1f} KB)\n".encode("utf-8")
+
+            yield b"\n"
+
+    yield _FOOTER_BYTES
+
+@functools.lru_cache(maxsize=1)
+def _static_summary():
+    """Return the filesystem-independent summary, built once per process."""
+    return b"".join(_iter_summary_lines(check_files=False))
+
+def solution_summary(check_files=True):
+    """Generate a comprehensive summary of the implemented solution."""
+    if not check_files:
+        _write_stdout(_static_summary())
+        return
+    _write_stdout(b"".join(_iter_summary_lines()))
 
 if __name__ == "__main__":
     solution_summary()
@@ -4,9 +4,9 @@ FastAPI Underwriting Application - Simplified Demo Version
 Modern web interface for real estate underwriting with dynamic uploads and progress tracking.
 """
 
-from fastapi import FastAPI, File, UploadFile, HTTPException, BackgroundTasks, Form
+from fastapi import FastAPI, File, UploadFile, HTTPException, BackgroundTasks, Form, Request
 from fastapi.staticfiles import StaticFiles
-from fastapi.responses import HTMLResponse, JSONResponse, FileResponse
+from fastapi.responses import HTMLResponse, JSONResponse, FileResponse, StreamingResponse, Response
 from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel
 from typing import List, Optional, Dict, Any
@@ -14,9 +14,22 @@ import os
 import uuid
 import json
 import asyncio
+import errno
 import shutil
+import sys
+import aiofiles
+import aiofiles.os
+import numpy as np
+import xlsxwriter
+from streaming_form_data import StreamingFormDataParser
+from streaming_form_data.targets import ListTarget, ValueTarget
+from concurrent.futures import ProcessPoolExecutor
+from collections import Counter, defaultdict
+from dataclasses import dataclass
 from datetime import datetime, timedelta
 import logging
+from session_store import SessionStore, status_encoder
+from upload_target import UploadedFilesTarget, invalid_file_types
 
 # Try to import the real processing components
 try:
@@ -64,16 +77,32 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Working directories, created once at import (before /static is mounted) instead of per job
+for directory in ("uploads", "outputs", "static", "templates"):
+    os.makedirs(directory, exist_ok=True)
+
 # Static files
 app.mount("/static", StaticFiles(directory="static"), name="static")
 
-# In-memory storage for processing status (in production, use Redis/database)
-processing_sessions = {}
 
 # Models for API requests/responses
 class ProcessingStatus(BaseModel):
     session_id: str
-    status: str  # "waiting", "processing", "completed", "error"
+    status: str  # "waiting", "queued", "processing", "completed", "error"
+    current_step: int
+    total_steps: int
+    step_name: str
+    progress_percentage: float
+    message: str
+    results: Optional[Dict[str, Any]] = None
+    error_message: Optional[str] = None
+
+# Stored session state: a slotted dataclass is cheap to mutate on every progress
+# update; ProcessingStatus above is only used to describe/validate API responses
+@dataclass(slots=True)
+class ProcessingStatusRecord:
+    session_id: str
+    status: str
     current_step: int
     total_steps: int
     step_name: str
@@ -88,32 +117,90 @@ class PropertyInfo(BaseModel):
     transaction_type: str = "refinance"
     is_bridge_loan: bool = False
 
+# Processing status storage: in-memory by default, shared via Redis when REDIS_URL is set
+processing_sessions = SessionStore(ProcessingStatusRecord, redis_url=os.getenv("REDIS_URL"))
+
+# Processes in the CPU pool: PROCESS_POOL_WORKERS when set, otherwise the CPUs split
+# between the WEB_CONCURRENCY uvicorn workers so together they don't oversubscribe the host
+PROCESS_POOL_WORKERS = int(os.getenv("PROCESS_POOL_WORKERS", "0")) or max(
+    1, (os.cpu_count() or 1) // int(os.getenv("WEB_CONCURRENCY", "1"))
+)
+
+# Worker pool for CPU-bound Excel/PDF generation, keeping the event loop free; created
+# on first use so importing the app doesn't start any processes
+_process_pool: Optional[ProcessPoolExecutor] = None
+
+def get_process_pool() -> ProcessPoolExecutor:
+    """Return the shared process pool, starting it on first use."""
+    global _process_pool
+    if _process_pool is None:
+        _process_pool = ProcessPoolExecutor(max_workers=PROCESS_POOL_WORKERS)
+    return _process_pool
+
+# Live progress subscribers: session_id -> queues of connected /api/stream clients
+progress_subscribers: Dict[str, List[asyncio.Queue]] = {}
+
+# Seconds between keep-alive checks on an idle progress stream
+PROGRESS_STREAM_KEEPALIVE = 15
+
+def notify_progress_subscribers(session_id: str):
+    """Wake up every stream client watching this session."""
+    for queue in progress_subscribers.get(session_id, ()):
+        queue.put_nowait(True)
+
+processing_sessions.on_change = notify_progress_subscribers
+
+# Uploads and outputs older than this are removed by the periodic cleanup task
+FILE_RETENTION_HOURS = float(os.getenv("FILE_RETENTION_HOURS", "24"))
+CLEANUP_INTERVAL_SECONDS = 3600
+
+# Maximum number of sessions processed at the same time
+JOB_SEM = asyncio.Semaphore(int(os.getenv("MAX_CONCURRENT_JOBS", "4")))
+
+# Updated PDFs larger than this are evicted from the page cache once written
+DROP_CACHE_MIN_BYTES = 16 * 1024 * 1024
+
+# Buffer size for user-space file copies and upload writes (1 MiB instead of the 4-8 KiB defaults)
+COPY_BUFFER_SIZE = 1024 * 1024
+
 # Setup logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+class ZeroCopyFileResponse(FileResponse):
+    """FileResponse that hands the file to the server via ASGI pathsend when supported."""
+    async def __call__(self, scope, receive, send):
+        extensions = scope.get("extensions") or {}
+        if "http.response.pathsend" not in extensions or self.send_header_only:
+            await super().__call__(scope, receive, send)
+            return
+        
+        if self.stat_result is None:
+            self.set_stat_headers(await aiofiles.os.stat(self.path))
+        await send({
+            "type": "http.response.start",
+            "status": self.status_code,
+            "headers": self.raw_headers,
+        })
+        # Let the server send the file directly (e.g. via sendfile)
+        await send({"type": "http.response.pathsend", "path": os.path.abspath(self.path)})
+        if self.background is not None:
+            await self.background()
+
 @app.get("/", response_class=HTMLResponse)
 async def read_root():
     """Serve the main application page."""
     return FileResponse("templates/index.html")
 
 @app.post("/api/upload")
-async def upload_documents(
-    background_tasks: BackgroundTasks,
-    property_name: str = Form(...),
-    property_address: str = Form(...),
-    transaction_type: str = Form("refinance"),
-    is_bridge_loan: bool = Form(False),
-    files: List[UploadFile] = File(...),
-    file_types: List[str] = Form([])
-):
+async def upload_documents(request: Request, background_tasks: BackgroundTasks):
     """
     Upload documents and start processing in background.
     Returns session ID for tracking progress.
-    """
-    if not files:
-        raise HTTPException(status_code=400, detail="No files uploaded")
     
+    The multipart body is parsed as it streams in, so each file is written
+    to disk chunk by chunk instead of being spooled to a temp file first.
+    """
     # Generate unique session ID
     session_id = str(uuid.uuid4())
     
@@ -121,33 +208,88 @@ async def upload_documents(
     session_dir = f"uploads/{session_id}"
     os.makedirs(session_dir, exist_ok=True)
     
-    # Save uploaded files with type information
+    # Register form fields and stream the request body through the parser
+    property_name_target = ValueTarget()
+    property_address_target = ValueTarget()
+    transaction_type_target = ValueTarget()
+    bridge_loan_target = ValueTarget()
+    file_types_target = ListTarget(str)
+    files_target = UploadedFilesTarget(session_dir, COPY_BUFFER_SIZE)
+    
+    parsed = False
+    try:
+        parser = StreamingFormDataParser(headers=request.headers)
+        parser.register("property_name", property_name_target)
+        parser.register("property_address", property_address_target)
+        parser.register("transaction_type", transaction_type_target)
+        parser.register("is_bridge_loan", bridge_loan_target)
+        parser.register("file_types", file_types_target)
+        parser.register("files", files_target)
+        
+        async for chunk in request.stream():
+            await parser.adata_received(chunk)
+        if files_target.receiving:
+            raise ValueError("request body ended in the middle of a file")
+        parsed = True
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=f"Invalid upload: {str(e)}")
+    finally:
+        # An aborted or cancelled request can stop mid-file: close its handle and drop the staged files
+        await files_target.aclose()
+        if not parsed:
+            shutil.rmtree(session_dir, ignore_errors=True)
+    
+    property_name = property_name_target.value.decode("utf-8")
+    property_address = property_address_target.value.decode("utf-8")
+    transaction_type = transaction_type_target.value.decode("utf-8") or "refinance"
+    is_bridge_loan = bridge_loan_target.value.decode("utf-8").lower() in ("true", "1", "on", "yes")
+    file_types = file_types_target.value
+    
+    if not property_name or not property_address:
+        shutil.rmtree(session_dir, ignore_errors=True)
+        raise HTTPException(status_code=422, detail="property_name and property_address are required")
+    
+    if not files_target.saved_files:
+        shutil.rmtree(session_dir, ignore_errors=True)
+        raise HTTPException(status_code=400, detail="No files uploaded")
+    
+    # Move staged files into their type-specific directories (rename, no copy)
     uploaded_files = []
     file_type_mapping = {}
+    file_sizes = {}  # Byte counts captured while streaming, so reports don't need to stat
     
-    for i, file in enumerate(files):
-        if file.filename:
-            # Get file type (rent_roll, t12, or additional)
-            file_type = file_types[i] if i < len(file_types) else 'additional'
-            
-            # Create type-specific directory
-            type_dir = os.path.join(session_dir, file_type)
-            os.makedirs(type_dir, exist_ok=True)
-            
-            file_path = os.path.join(type_dir, file.filename)
-            with open(file_path, "wb") as buffer:
-                shutil.copyfileobj(file.file, buffer)
-            
-            uploaded_files.append(file_path)
-            file_type_mapping[file_path] = file_type
+    # Get file type for each file (rent_roll, t12, or additional)
+    saved_file_types = [
+        file_types[i] if i < len(file_types) else 'additional'
+        for i, _, _ in files_target.saved_files
+    ]
+    
+    # File types become directory names, so only the known ones are accepted
+    unknown_types = invalid_file_types(saved_file_types)
+    if unknown_types:
+        shutil.rmtree(session_dir, ignore_errors=True)
+        raise HTTPException(status_code=400, detail=f"Unknown file types: {', '.join(unknown_types)}")
+    
+    # Create each type-specific directory once, not once per file
+    for file_type in set(saved_file_types):
+        os.makedirs(os.path.join(session_dir, file_type), exist_ok=True)
+    
+    for (_, staged_path, filename), file_type in zip(files_target.saved_files, saved_file_types):
+        file_path = os.path.join(session_dir, file_type, filename)
+        os.replace(staged_path, file_path)
+        
+        uploaded_files.append(file_path)
+        file_type_mapping[file_path] = file_type
+        file_sizes[file_path] = files_target.file_sizes[staged_path]
     
     # Count files by type
-    rent_roll_count = sum(1 for ft in file_types if ft == 'rent_roll')
-    t12_count = sum(1 for ft in file_types if ft == 't12')
-    additional_count = sum(1 for ft in file_types if ft == 'additional')
+    type_counts = Counter(file_types)
+    rent_roll_count = type_counts['rent_roll']
+    t12_count = type_counts['t12']
+    additional_count = type_counts['additional']
     
     # Initialize processing status
-    processing_sessions[session_id] = ProcessingStatus(
+    await processing_sessions.save(ProcessingStatusRecord(
         session_id=session_id,
         status="waiting",
         current_step=0,
@@ -155,7 +297,7 @@ async def upload_documents(
         step_name="Initializing...",
         progress_percentage=0.0,
         message=f"Preparing to process {len(uploaded_files)} documents"
-    )
+    ))
     
     # Property information
     property_info = PropertyInfo(
@@ -171,7 +313,8 @@ async def upload_documents(
         session_id,
         uploaded_files,
         file_type_mapping,
-        property_info
+        property_info,
+        file_sizes
     )
     
     return {
@@ -182,88 +325,167 @@ async def upload_documents(
             "rent_roll": rent_roll_count,
             "t12": t12_count,
             "additional": additional_count
-        }
+        },
+        # Tells the page how to follow progress: server-sent events from /api/stream
+        "progress_transport": "sse"
     }
 
-@app.get("/api/status/{session_id}")
+@app.get("/api/status/{session_id}", response_model=ProcessingStatus)
 async def get_processing_status(session_id: str):
     """Get current processing status for a session."""
-    if session_id not in processing_sessions:
+    session = await processing_sessions.get(session_id)
+    if session is None:
+        raise HTTPException(status_code=404, detail="Session not found")
+    
+    # Encode the record directly; ProcessingStatus only documents the schema
+    return Response(status_encoder.encode(session), media_type="application/json")
+
+async def relay_change_notifications(pubsub, queue: asyncio.Queue):
+    """Forward Redis change notifications for a session into a stream's wake-up queue."""
+    async for message in pubsub.listen():
+        if message["type"] == "message":
+            queue.put_nowait(True)
+
+@app.get("/api/stream/{session_id}")
+async def stream_processing_status(session_id: str):
+    """Push status updates as Server-Sent Events until processing finishes."""
+    if not await processing_sessions.exists(session_id):
         raise HTTPException(status_code=404, detail="Session not found")
     
-    return processing_sessions[session_id]
+    async def event_stream():
+        queue = asyncio.Queue()
+        progress_subscribers.setdefault(session_id, []).append(queue)
+        
+        # With Redis, also wake up on updates written by other workers
+        pubsub = await processing_sessions.subscribe(session_id)
+        relay = asyncio.create_task(relay_change_notifications(pubsub, queue)) if pubsub else None
+        try:
+            while True:
+                session = await processing_sessions.get(session_id)
+                if session is None:
+                    break
+                yield b"data: " + status_encoder.encode(session) + b"\n\n"
+                if session.status in ("completed", "error"):
+                    break
+                
+                try:
+                    await asyncio.wait_for(queue.get(), timeout=PROGRESS_STREAM_KEEPALIVE)
+                except asyncio.TimeoutError:
+                    # Re-read the store anyway as a keep-alive
+                    pass
+                # Collapse bursts of updates into a single event
+                while not queue.empty():
+                    queue.get_nowait()
+        finally:
+            if relay is not None:
+                relay.cancel()
+                await pubsub.reset()
+            subscribers = progress_subscribers.get(session_id, [])
+            if queue in subscribers:
+                subscribers.remove(queue)
+            if not subscribers:
+                progress_subscribers.pop(session_id, None)
+    
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
 
 @app.get("/api/results/{session_id}")
 async def get_results(session_id: str):
     """Get final results for completed session."""
-    if session_id not in processing_sessions:
+    session = await processing_sessions.get(session_id)
+    if session is None:
         raise HTTPException(status_code=404, detail="Session not found")
     
-    session = processing_sessions[session_id]
     if session.status != "completed":
         raise HTTPException(status_code=400, detail="Processing not completed")
     
     return session.results
 
+# Downloadable file types: results key holding the path, and the media type to serve it with
+DOWNLOAD_TYPES = {
+    "excel": ("excel_path", "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"),
+    "pdf": ("pdf_path", "application/pdf"),
+}
+
 @app.get("/api/download/{session_id}/{file_type}")
 async def download_file(session_id: str, file_type: str):
     """Download generated files (excel or pdf)."""
-    if session_id not in processing_sessions:
+    session = await processing_sessions.get(session_id)
+    if session is None:
         raise HTTPException(status_code=404, detail="Session not found")
     
-    session = processing_sessions[session_id]
     if session.status != "completed" or not session.results:
         raise HTTPException(status_code=400, detail="No files available")
     
-    if file_type == "excel":
-        file_path = session.results.get("excel_path")
-    elif file_type == "pdf":
-        file_path = session.results.get("pdf_path")
-    else:
+    if file_type not in DOWNLOAD_TYPES:
         raise HTTPException(status_code=400, detail="Invalid file type")
+    result_key, media_type = DOWNLOAD_TYPES[file_type]
+    file_path = session.results.get(result_key)
+    
+    if not file_path:
+        raise HTTPException(status_code=404, detail="File not found")
     
-    if not file_path or not os.path.exists(file_path):
+    # Single stat call (off the event loop), reused for the response headers
+    try:
+        stat_result = await aiofiles.os.stat(file_path)
+    except FileNotFoundError:
         raise HTTPException(status_code=404, detail="File not found")
     
-    return FileResponse(
+    return ZeroCopyFileResponse(
         file_path,
-        media_type="application/octet-stream",
-        filename=os.path.basename(file_path)
+        media_type=media_type,
+        filename=os.path.basename(file_path),
+        stat_result=stat_result
     )
 
+def group_files_by_type(file_type_mapping: Dict[str, str]) -> Dict[str, List[str]]:
+    """Group uploaded file paths by document type in a single pass."""
+    files_by_type = defaultdict(list)
+    for file_path, file_type in file_type_mapping.items():
+        files_by_type[file_type].append(file_path)
+    return files_by_type
+
 async def process_documents_background(
     session_id: str,
     uploaded_files: List[str],
     file_type_mapping: Dict[str, str],
-    property_info: PropertyInfo
+    property_info: PropertyInfo,
+    file_sizes: Optional[Dict[str, int]] = None
 ):
     """
     Background task for processing documents with real PDF extraction and analysis.
     Falls back to simulation if real processing components are not available.
     """
     try:
-        session = processing_sessions[session_id]
-        session.status = "processing"
+        # Wait for a free job slot so bursts of uploads don't all build at once
+        await processing_sessions.update(session_id, status="queued", message="Waiting for an available processing slot...")
         
-        # Check if real processing is available
-        if REAL_PROCESSING_AVAILABLE:
-            logger.info(f"🔬 Using REAL PDF processing for session {session_id}")
-            await process_with_real_components(session_id, uploaded_files, file_type_mapping, property_info)
-        else:
-            logger.info(f"🎭 Using FALLBACK processing for session {session_id}")
-            await process_with_fallback_mode(session_id, uploaded_files, file_type_mapping, property_info)
+        async with JOB_SEM:
+            await processing_sessions.update(session_id, status="processing")
+            
+            # Check if real processing is available
+            if REAL_PROCESSING_AVAILABLE:
+                logger.info(f"🔬 Using REAL PDF processing for session {session_id}")
+                await process_with_real_components(session_id, uploaded_files, file_type_mapping, property_info, file_sizes)
+            else:
+                logger.info(f"🎭 Using FALLBACK processing for session {session_id}")
+                await process_with_fallback_mode(session_id, uploaded_files, file_type_mapping, property_info)
             
     except Exception as e:
         logger.error(f"❌ Critical error in processing session {session_id}: {str(e)}")
         import traceback
         traceback.print_exc()
         
-        session = processing_sessions[session_id]
+        session = await processing_sessions.get(session_id)
         session.status = "error"
         session.error_message = str(e)
         session.message = f"Processing failed: {str(e)}"
         session.current_step = 0
         session.progress_percentage = 0.0
+        await processing_sessions.save(session)
 
 async def process_with_fallback_mode(
     session_id: str,
@@ -272,17 +494,17 @@ async def process_with_fallback_mode(
     property_info: PropertyInfo
 ):
     """Process documents using fallback simulation mode when real components aren't available."""
-    session = processing_sessions[session_id]
+    session = await processing_sessions.get(session_id)
     
     # Categorize files by type
-    rent_roll_files = [f for f, t in file_type_mapping.items() if t == 'rent_roll']
-    t12_files = [f for f, t in file_type_mapping.items() if t == 't12']
-    additional_files = [f for f, t in file_type_mapping.items() if t == 'additional']
+    files_by_type = group_files_by_type(file_type_mapping)
+    rent_roll_files = files_by_type['rent_roll']
+    t12_files = files_by_type['t12']
+    additional_files = files_by_type['additional']
     
     # Step 1: Simulate Document Processing
-    update_progress(session_id, 1, "Document Processing (Simulation)", 
+    await update_progress(session_id, 1, "Document Processing (Simulation)", 
                    f"Simulating processing of {len(uploaded_files)} documents...")
-    await asyncio.sleep(2)
     
     # Step 2-8: Continue with existing simulation logic
     # Calculate estimated units and basic metrics
@@ -308,25 +530,57 @@ async def process_with_fallback_mode(
     operating_expenses = effective_gross_income * expense_ratio
     noi = effective_gross_income - operating_expenses
     
-    # Continue with remaining steps...
-    for step in range(2, 9):
-        step_names = {
-            2: "T12 Processing (Simulation)",
-            3: "Additional Documents (Simulation)", 
-            4: "Rent Roll Analysis (Simulation)",
-            5: "T12 Analysis (Simulation)",
-            6: "Underwriting Summary (Simulation)",
-            7: "Excel Generation (Simulation)",
-            8: "PDF Generation (Simulation)"
-        }
-        update_progress(session_id, step, step_names[step], f"Simulating {step_names[step].lower()}...")
-        await asyncio.sleep(1)
+    # Steps 2-6 are pure calculations above; steps 7-8 report the real file generation
+    step_names = {
+        2: "T12 Processing (Simulation)",
+        3: "Additional Documents (Simulation)", 
+        4: "Rent Roll Analysis (Simulation)",
+        5: "T12 Analysis (Simulation)",
+        6: "Underwriting Summary (Simulation)"
+    }
+    for step, step_name in step_names.items():
+        await update_progress(session_id, step, step_name, f"Simulating {step_name.lower()}...")
     
     # Create basic output files
     await create_fallback_outputs(session_id, property_info, quality_score, noi, 
                                  gross_potential_income, effective_gross_income, 
                                  operating_expenses, estimated_units, uploaded_files)
 
+def build_fallback_excel(excel_path: str, summary_data: List[List[str]]):
+    """Write the basic fallback summary workbook (runs in the worker pool)."""
+    wb = xlsxwriter.Workbook(excel_path, {'constant_memory': True})
+    ws = wb.add_worksheet("Analysis Summary")
+    
+    for row_num, row_data in enumerate(summary_data):
+        ws.write_row(row_num, 0, row_data)
+    
+    wb.close()
+
+def build_fallback_pdf(pdf_path: str, property_name: str, noi: float):
+    """Write the basic fallback PDF (runs in the worker pool)."""
+    from reportlab.lib.pagesizes import letter
+    from reportlab.pdfgen import canvas
+    
+    page_width, page_height = letter
+    c = canvas.Canvas(pdf_path, pagesize=letter)
+    
+    c.setFont("Helvetica-Bold", 18)
+    c.drawCentredString(page_width / 2, page_height - 90, "Real Estate Analysis (Simulation Mode)")
+    
+    c.setFont("Helvetica", 10)
+    y = page_height - 130
+    for line in [
+        f"Property: {property_name}",
+        "Analysis Mode: Fallback simulation due to missing PDF processing dependencies",
+        "",
+        f"Net Operating Income: ${noi:,.0f}"
+    ]:
+        c.drawString(72, y, line)
+        y -= 14
+    
+    c.showPage()
+    c.save()
+
 async def create_fallback_outputs(
     session_id: str,
     property_info: PropertyInfo,
@@ -339,7 +593,7 @@ async def create_fallback_outputs(
     uploaded_files: List[str]
 ):
     """Create basic Excel and PDF outputs when real processing isn't available."""
-    session = processing_sessions[session_id]
+    session = await processing_sessions.get(session_id)
     
     # Create file paths
     clean_property_name = property_info.property_name.replace(' ', ' ').strip()
@@ -349,17 +603,6 @@ async def create_fallback_outputs(
     pdf_filename = f"{clean_property_name} Package {timestamp}.pdf"
     pdf_path = f"outputs/{pdf_filename}"
     
-    os.makedirs("outputs", exist_ok=True)
-    
-    # Create basic Excel file
-    import pandas as pd
-    from openpyxl import Workbook
-    from openpyxl.styles import Font, PatternFill
-    
-    wb = Workbook()
-    ws = wb.active
-    ws.title = "Analysis Summary"
-    
     # Basic summary data
     summary_data = [
         ["PROPERTY ANALYSIS (SIMULATED)", ""],
@@ -377,30 +620,12 @@ async def create_fallback_outputs(
         ["Estimated Units", str(estimated_units)]
     ]
     
-    for row_num, (label, value) in enumerate(summary_data, 1):
-        ws.cell(row=row_num, column=1, value=label)
-        ws.cell(row=row_num, column=2, value=value)
-    
-    wb.save(excel_path)
-    
-    # Create basic PDF
-    from reportlab.lib.pagesizes import letter
-    from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer
-    from reportlab.lib.styles import getSampleStyleSheet
-    from reportlab.lib import colors
-    
-    doc = SimpleDocTemplate(pdf_path, pagesize=letter)
-    story = []
-    styles = getSampleStyleSheet()
-    
-    story.append(Paragraph("Real Estate Analysis (Simulation Mode)", styles['Title']))
-    story.append(Spacer(1, 20))
-    story.append(Paragraph(f"Property: {property_info.property_name}", styles['Normal']))
-    story.append(Paragraph(f"Analysis Mode: Fallback simulation due to missing PDF processing dependencies", styles['Normal']))
-    story.append(Spacer(1, 10))
-    story.append(Paragraph(f"Net Operating Income: ${noi:,.0f}", styles['Normal']))
-    
-    doc.build(story)
+    # Build the Excel and PDF files in the worker pool
+    loop = asyncio.get_running_loop()
+    await update_progress(session_id, 7, "Excel Generation (Simulation)", "Writing summary workbook...")
+    await loop.run_in_executor(get_process_pool(), build_fallback_excel, excel_path, summary_data)
+    await update_progress(session_id, 8, "PDF Generation (Simulation)", "Writing summary PDF...")
+    await loop.run_in_executor(get_process_pool(), build_fallback_pdf, pdf_path, property_info.property_name, noi)
     
     # Complete the session
     session.status = "completed"
@@ -429,20 +654,284 @@ async def create_fallback_outputs(
         },
         "excel_path": excel_path,
         "pdf_path": pdf_path,
+        "pdf_base_name": os.path.splitext(pdf_path)[0],
         "analysis_success": True
     }
+    await processing_sessions.save(session)
     
     logger.info(f"✅ Fallback processing completed for session {session_id}")
 
+# Cell styles for the analysis workbook (xlsxwriter format properties)
+EXCEL_FORMATS = {
+    "section": {'bold': True, 'font_size': 12, 'bg_color': '#E6E6FA'},
+    "file_header": {'bold': True, 'bg_color': '#D3D3D3'},
+    "rentroll_header": {'bold': True, 'bg_color': '#90EE90'},
+    "projection_header": {'bold': True, 'bg_color': '#FFFF99'},
+}
+
+def track_column_widths(col_max: Dict[int, int], row_data: List[Any]):
+    """Record the longest value seen so far in each column of a written row."""
+    for col, value in enumerate(row_data):
+        length = len(str(value))
+        if length > col_max[col]:
+            col_max[col] = length
+
+def apply_column_widths(ws, col_max: Dict[int, int]):
+    """Size each column to its longest value (capped at 50), like Excel's autofit."""
+    for col, max_length in col_max.items():
+        ws.set_column(col, col, min(max_length + 2, 50))
+
+def build_analysis_excel(excel_path: str, data: Dict[str, Any]):
+    """Build the detailed analysis workbook (runs in the worker pool)."""
+    summary_data = data["summary_data"]
+    file_type_mapping = data["file_type_mapping"]
+    file_sizes = data.get("file_sizes", {})
+    estimated_units = data["estimated_units"]
+    gross_potential_income = data["gross_potential_income"]
+    vacancy_factor = data["vacancy_factor"]
+    effective_gross_income = data["effective_gross_income"]
+    operating_expenses = data["operating_expenses"]
+    noi = data["noi"]
+    
+    # constant_memory streams each row to disk as soon as the next row starts
+    wb = xlsxwriter.Workbook(excel_path, {'constant_memory': True, 'use_zip64': True})
+    
+    # Formats are created once per workbook and shared by every cell that uses them
+    formats = {name: wb.add_format(spec) for name, spec in EXCEL_FORMATS.items()}
+    section_format = formats["section"]
+    file_header_format = formats["file_header"]
+    rentroll_header_format = formats["rentroll_header"]
+    projection_header_format = formats["projection_header"]
+    
+    file_headers = ["File Name", "Type", "Size (MB)", "Status"]
+    file_rows = [
+        [
+            os.path.basename(file_path),
+            file_type.replace('_', ' ').title(),
+            # Size recorded at upload; stat only for files that weren't streamed in
+            f"{(file_sizes[file_path] if file_path in file_sizes else os.path.getsize(file_path)) / (1024 * 1024):.1f}",  # MB
+            "Processed"
+        ]
+        for file_path, file_type in file_type_mapping.items()
+    ]
+    
+    # Summary Sheet
+    ws_summary = wb.add_worksheet("Executive Summary")
+    col_max = defaultdict(int)
+    
+    for row_num, (label, value) in enumerate(summary_data):
+        # Style headers
+        if label in ["PROPERTY ANALYSIS SUMMARY", "DOCUMENT SUMMARY", "FINANCIAL SUMMARY", "FLAGS & NOTES"]:
+            ws_summary.write(row_num, 0, label, section_format)
+        else:
+            ws_summary.write(row_num, 0, label)
+        ws_summary.write(row_num, 1, value)
+        track_column_widths(col_max, (label, value))
+    
+    # Auto-adjust column widths from the lengths tracked while writing
+    apply_column_widths(ws_summary, col_max)
+    
+    # File Details Sheet
+    ws_files = wb.add_worksheet("File Details")
+    col_max = defaultdict(int)
+    ws_files.write_row(0, 0, file_headers, file_header_format)
+    track_column_widths(col_max, file_headers)
+    for row_num, row_data in enumerate(file_rows, 1):
+        ws_files.write_row(row_num, 0, row_data)
+        track_column_widths(col_max, row_data)
+    apply_column_widths(ws_files, col_max)
+    
+    # Add Rent Roll Simulation Sheet (based on actual property analysis)
+    ws_rentroll = wb.add_worksheet("Rent Roll Analysis")
+    
+    # Generate dynamic rent roll data
+    rentroll_headers = ["Unit #", "Unit Type", "Sq Ft", "Current Rent", "Market Rent", "Lease Expiry", "Status"]
+    ws_rentroll.write_row(0, 0, rentroll_headers, rentroll_header_format)
+    
+    # Generate realistic unit data in one batch
+    unit_types = np.array(["1BR/1BA", "2BR/2BA", "3BR/2BA", "Studio"])
+    sq_ft_low = np.array([650, 900, 1200, 450])  # Same order as unit_types
+    sq_ft_high = np.array([850, 1200, 1600, 600])
+    statuses = np.array(["Occupied", "Occupied", "Occupied", "Vacant", "Notice"])
+    
+    # Seeded from the session so the same session always gets the same rent roll
+    rng = np.random.default_rng(uuid.UUID(data["session_id"]).int)
+    n_units = max(0, min(estimated_units, 50))  # Limit to 50 units for demo
+    
+    type_idx = rng.integers(0, len(unit_types), size=n_units)
+    sq_ft = rng.integers(sq_ft_low[type_idx], sq_ft_high[type_idx] + 1)
+    base_rent = sq_ft * (1.5 + rng.uniform(-0.2, 0.3, size=n_units))  # $1.30-$1.80 per sq ft
+    market_rent = base_rent * rng.uniform(1.02, 1.08, size=n_units)  # Market rent slightly higher
+    lease_months = rng.integers(1, 19, size=n_units)
+    status = statuses[rng.integers(0, len(statuses), size=n_units)]
+    
+    total_rent = base_rent[status == "Occupied"].sum()
+    
+    # Only 18 possible expiry months, so format each once
+    now = datetime.now()
+    expiry_labels = [(now + timedelta(days=months * 30)).strftime("%m/%Y") for months in range(19)]
+    
+    for i, (t, ft, rent, market, months, unit_status) in enumerate(zip(
+        unit_types[type_idx].tolist(), sq_ft.tolist(), base_rent.tolist(),
+        market_rent.tolist(), lease_months.tolist(), status.tolist()
+    ), 1):
+        ws_rentroll.write_row(i, 0, [
+            f"Unit {i:03d}",
+            t,
+            ft,
+            f"${rent:,.0f}",
+            f"${market:,.0f}",
+            expiry_labels[months],
+            unit_status
+        ])
+    
+    # Add Financial Projections Sheet
+    ws_projections = wb.add_worksheet("Financial Projections")
+    
+    # Each line item is a base amount times a ratio, grown by the yearly factors
+    years = np.array([1.0, 1.03, 1.06])  # 3% annual growth
+    line_items = [
+        ("Gross Potential Rent", gross_potential_income, 1.0, "3% annual growth"),
+        ("Vacancy Loss", gross_potential_income, vacancy_factor, f"{vacancy_factor:.1%} vacancy"),
+        ("Other Income", gross_potential_income, 0.02, "Parking, fees, etc."),
+        ("Effective Gross Income", effective_gross_income, 1.0, ""),
+        ("Property Management", effective_gross_income, 0.05, "5% of EGI"),
+        ("Property Taxes", effective_gross_income, 0.12, "Market rate"),
+        ("Insurance", effective_gross_income, 0.03, "Property insurance"),
+        ("Maintenance & Repairs", effective_gross_income, 0.08, "Regular maintenance"),
+        ("Utilities", effective_gross_income, 0.04, "Common areas"),
+        ("Other Expenses", effective_gross_income, 0.03, "Miscellaneous"),
+        ("Total Operating Expenses", operating_expenses, 1.0, ""),
+        ("NET OPERATING INCOME", noi, 1.0, ""),
+        ("Cash Flow After Debt Service", noi, 0.75, "Assuming 75% leverage")
+    ]
+    amounts = np.array([base * ratio for _, base, ratio, _ in line_items])
+    matrix = np.outer(amounts, years)
+    
+    item_rows = [
+        [label] + [f"${value:,.0f}" for value in values] + [note]
+        for (label, _, _, note), values in zip(line_items, matrix.tolist())
+    ]
+    
+    blank_row = ["", "", "", "", ""]
+    projections_data = (
+        [["INCOME PROJECTIONS", "", "", "", ""], ["Line Item", "Year 1", "Year 2", "Year 3", "Notes"]]
+        + item_rows[:4]
+        + [blank_row, ["OPERATING EXPENSES", "", "", "", ""]]
+        + item_rows[4:11]
+        + [blank_row]
+        + item_rows[11:]
+    )
+    
+    for row_num, row_data in enumerate(projections_data):
+        for col_num, value in enumerate(row_data):
+            if row_num == 0 or "INCOME PROJECTIONS" in value or "OPERATING EXPENSES" in value:
+                ws_projections.write(row_num, col_num, value, projection_header_format)
+            else:
+                ws_projections.write(row_num, col_num, value)
+    
+    wb.close()
+
+def draw_label_table(c, x: float, y: float, rows: List[List[str]], label_color) -> float:
+    """Draw a two-column label/value table with a grid; returns the y below it."""
+    from reportlab.lib import colors
+    from reportlab.lib.units import inch
+    
+    label_width, value_width, row_height = 2 * inch, 4 * inch, 18
+    
+    c.setLineWidth(1)
+    c.setStrokeColor(colors.black)
+    c.setFont("Helvetica", 10)
+    for label, value in rows:
+        y -= row_height
+        c.setFillColor(label_color)
+        c.rect(x, y, label_width, row_height, stroke=1, fill=1)
+        c.rect(x + label_width, y, value_width, row_height, stroke=1, fill=0)
+        c.setFillColor(colors.black)
+        c.drawString(x + 6, y + 6, label)
+        c.drawString(x + label_width + 6, y + 6, str(value))
+    return y
+
+def build_analysis_pdf(pdf_path: str, data: Dict[str, Any]):
+    """Build the analysis PDF package (runs in the worker pool)."""
+    from reportlab.lib.pagesizes import letter
+    from reportlab.lib.utils import simpleSplit
+    from reportlab.pdfgen import canvas
+    from reportlab.lib import colors
+    
+    # Fixed one-page layout drawn straight onto the canvas (no flowable layout pass)
+    page_width, page_height = letter
+    left = 72
+    text_width = page_width - 2 * left
+    
+    c = canvas.Canvas(pdf_path, pagesize=letter)
+    
+    # Title
+    c.setFont("Helvetica-Bold", 24)
+    c.setFillColor(colors.darkblue)
+    c.drawCentredString(page_width / 2, page_height - 100, "Real Estate Underwriting Analysis")
+    y = page_height - 160
+    
+    def section_heading(title, y):
+        c.setFont("Helvetica-Bold", 16)
+        c.setFillColor(colors.darkgreen)
+        c.drawString(left, y, title)
+        return y - 8
+    
+    # Property Information
+    y = section_heading("Property Information", y)
+    property_data = [
+        ["Property Name:", data["property_name"]],
+        ["Address:", data["property_address"]],
+        ["Transaction Type:", data["transaction_type"].title()],
+        ["Analysis Date:", datetime.now().strftime("%B %d, %Y")],
+        ["Bridge Loan:", "Yes" if data["is_bridge_loan"] else "No"]
+    ]
+    y = draw_label_table(c, left, y, property_data, colors.lightgrey) - 36
+    
+    # Financial Summary
+    y = section_heading("Financial Summary", y)
+    financial_data = [
+        ["Net Operating Income:", f"${data['noi']:,.0f}"],
+        ["Cap Rate:", f"{data['cap_rate']:.2f}%"],
+        ["Cash-on-Cash Return:", f"{data['cash_return']:.2f}%"],
+        ["Property Value:", f"${data['property_value']:,.0f}"],
+        ["Quality Score:", f"{data['quality_score']}/100"]
+    ]
+    y = draw_label_table(c, left, y, financial_data, colors.lightblue) - 36
+    
+    # File Analysis Summary and footer (omitted for the error-recovery PDF)
+    if data.get("doc_summary"):
+        y = section_heading("Document Analysis", y) - 14
+        c.setFont("Helvetica", 10)
+        c.setFillColor(colors.black)
+        for line in data["doc_summary"].split("\n"):
+            c.drawString(left, y, line)
+            y -= 14
+        y -= 20
+        
+        # Footer
+        footer_text = "This analysis was generated by the Real Estate Underwriting AI System. " \
+                     "For questions or additional analysis, please contact your underwriting team."
+        c.setFont("Helvetica-Oblique", 10)
+        for line in simpleSplit(footer_text, "Helvetica-Oblique", 10, text_width):
+            c.drawString(left, y, line)
+            y -= 12
+    
+    c.showPage()
+    c.save()
+
 async def process_with_real_components(
     session_id: str,
     uploaded_files: List[str],
     file_type_mapping: Dict[str, str],
-    property_info: PropertyInfo
+    property_info: PropertyInfo,
+    file_sizes: Optional[Dict[str, int]] = None
 ):
     """Process documents using real PDF extraction components."""
     try:
-        session = processing_sessions[session_id]
+        session = await processing_sessions.get(session_id)
+        loop = asyncio.get_running_loop()
         
         # Initialize real processors
         processor = DocumentProcessor(debug=True)
@@ -461,36 +950,36 @@ async def process_with_real_components(
             'state': property_info.property_address.split(',')[-1].strip()[:2] if ',' in property_info.property_address else 'Unknown'
         })
     
-    # Categorize files by type
-    rent_roll_files = [f for f, t in file_type_mapping.items() if t == 'rent_roll']
-    t12_files = [f for f, t in file_type_mapping.items() if t == 't12']
-    additional_files = [f for f, t in file_type_mapping.items() if t == 'additional']
+        # Categorize files by type
+        files_by_type = group_files_by_type(file_type_mapping)
+        rent_roll_files = files_by_type['rent_roll']
+        t12_files = files_by_type['t12']
+        additional_files = files_by_type['additional']
     
-    processed_data = {}
+        processed_data = {}
     
-    # Step 1: Document Processing - Process rent roll files
-    if rent_roll_files:
-        update_progress(session_id, 1, "Document Processing", 
-                       f"Extracting tables from {len(rent_roll_files)} rent roll document(s)...")
+        # Step 1: Document Processing - Process rent roll files
+        if rent_roll_files:
+            await update_progress(session_id, 1, "Document Processing", 
+                           f"Extracting tables from {len(rent_roll_files)} rent roll document(s)...")
         
-        for file_path in rent_roll_files:
-            try:
-                logger.info(f"📄 Processing rent roll: {file_path}")
-                results = processor.process_document(file_path)
-                processed_data['rent_roll'] = results
-                logger.info(f"✅ Rent roll processed: {len(results['tables'])} tables found")
-            except Exception as e:
-                logger.error(f"❌ Error processing rent roll {file_path}: {str(e)}")
-                session.message = f"Warning: Error processing rent roll - {str(e)[:100]}"
-    else:
-        update_progress(session_id, 1, "Document Processing", 
-                       "No rent roll files - will use property assumptions...")
-        await asyncio.sleep(0.5)
+            for file_path in rent_roll_files:
+                try:
+                    logger.info(f"📄 Processing rent roll: {file_path}")
+                    results = processor.process_document(file_path)
+                    processed_data['rent_roll'] = results
+                    logger.info(f"✅ Rent roll processed: {len(results['tables'])} tables found")
+                except Exception as e:
+                    logger.error(f"❌ Error processing rent roll {file_path}: {str(e)}")
+                    await processing_sessions.update(session_id, message=f"Warning: Error processing rent roll - {str(e)[:100]}")
+        else:
+            await update_progress(session_id, 1, "Document Processing", 
+                           "No rent roll files - will use property assumptions...")
         
         
         # Step 2: Process T12 files
         if t12_files:
-            update_progress(session_id, 2, "T12 Processing", 
+            await update_progress(session_id, 2, "T12 Processing", 
                            f"Extracting data from {len(t12_files)} T12 document(s)...")
             
             for file_path in t12_files:
@@ -501,15 +990,14 @@ async def process_with_real_components(
                     logger.info(f"✅ T12 processed: {len(results['tables'])} tables found")
                 except Exception as e:
                     logger.error(f"❌ Error processing T12 {file_path}: {str(e)}")
-                    session.message = f"Warning: Error processing T12 - {str(e)[:100]}"
+                    await processing_sessions.update(session_id, message=f"Warning: Error processing T12 - {str(e)[:100]}")
         else:
-            update_progress(session_id, 2, "T12 Processing", 
+            await update_progress(session_id, 2, "T12 Processing", 
                            "No T12 files - will use market assumptions...")
-            await asyncio.sleep(0.5)
         
         # Step 3: Process additional files
         if additional_files:
-            update_progress(session_id, 3, "Additional Documents", 
+            await update_progress(session_id, 3, "Additional Documents", 
                            f"Processing {len(additional_files)} additional document(s)...")
             
             for file_path in additional_files:
@@ -523,13 +1011,12 @@ async def process_with_real_components(
                 except Exception as e:
                     logger.error(f"❌ Error processing additional file {file_path}: {str(e)}")
         else:
-            update_progress(session_id, 3, "Additional Documents", "No additional files provided...")
-            await asyncio.sleep(0.5)
+            await update_progress(session_id, 3, "Additional Documents", "No additional files provided...")
         
         # Step 4: Rent Roll Analysis
         rent_roll_analysis = {}
         if 'rent_roll' in processed_data and processed_data['rent_roll'].get('tables'):
-            update_progress(session_id, 4, "Rent Roll Analysis", "Analyzing unit mix and rental income...")
+            await update_progress(session_id, 4, "Rent Roll Analysis", "Analyzing unit mix and rental income...")
             
             try:
                 rent_roll_df = processed_data['rent_roll']['tables'][0]  # Use first/best table
@@ -537,15 +1024,14 @@ async def process_with_real_components(
                 logger.info(f"✅ Rent roll analysis completed")
             except Exception as e:
                 logger.error(f"❌ Error analyzing rent roll: {str(e)}")
-                session.message = f"Warning: Rent roll analysis failed - {str(e)[:100]}"
+                await processing_sessions.update(session_id, message=f"Warning: Rent roll analysis failed - {str(e)[:100]}")
         else:
-            update_progress(session_id, 4, "Rent Roll Analysis", "Using property assumptions for rental income...")
-            await asyncio.sleep(1)
+            await update_progress(session_id, 4, "Rent Roll Analysis", "Using property assumptions for rental income...")
         
         # Step 5: T12 Analysis
         t12_analysis = {}
         if 't12' in processed_data and processed_data['t12'].get('tables'):
-            update_progress(session_id, 5, "T12 Analysis", "Analyzing operating statements and expenses...")
+            await update_progress(session_id, 5, "T12 Analysis", "Analyzing operating statements and expenses...")
             
             try:
                 t12_df = processed_data['t12']['tables'][0]  # Use first/best table
@@ -553,14 +1039,13 @@ async def process_with_real_components(
                 logger.info(f"✅ T12 analysis completed")
             except Exception as e:
                 logger.error(f"❌ Error analyzing T12: {str(e)}")
-                session.message = f"Warning: T12 analysis failed - {str(e)[:100]}"
+                await processing_sessions.update(session_id, message=f"Warning: T12 analysis failed - {str(e)[:100]}")
         else:
-            update_progress(session_id, 5, "T12 Analysis", "Using market assumptions for operating expenses...")
-            await asyncio.sleep(1)
+            await update_progress(session_id, 5, "T12 Analysis", "Using market assumptions for operating expenses...")
         
         
         # Step 6: Generate Underwriting Summary
-        update_progress(session_id, 6, "Underwriting Summary", "Generating comprehensive analysis...")
+        await update_progress(session_id, 6, "Underwriting Summary", "Generating comprehensive analysis...")
         
         try:
             summary = analyzer.generate_underwriting_summary()
@@ -586,7 +1071,7 @@ async def process_with_real_components(
             }
         
         # Step 7: Excel Generation
-        update_progress(session_id, 7, "Excel Generation", "Creating professional underwriting package...")
+        await update_progress(session_id, 7, "Excel Generation", "Creating professional underwriting package...")
         
         # Calculate metrics from analysis or use fallbacks
         if summary and 'noi_analysis' in summary:
@@ -639,7 +1124,6 @@ async def process_with_real_components(
         timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
         excel_filename = f"{clean_property_name} Analysis {timestamp}.xlsx"
         excel_path = f"outputs/{excel_filename}"
-        os.makedirs("outputs", exist_ok=True)
         
         try:
             # Use the output generator to create professional Excel
@@ -666,9 +1150,20 @@ async def process_with_real_components(
             # Use simple fallback Excel creation (code will be added after completing function)
             pass
         
-        # Step 8: PDF Generation  
-        update_progress(session_id, 8, "PDF Generation", "Creating lender-ready PDF package...")
+        # Plain-data payload for the PDF worker
+        pdf_data = {
+            "property_name": property_info.property_name,
+            "property_address": property_info.property_address,
+            "transaction_type": property_info.transaction_type,
+            "is_bridge_loan": property_info.is_bridge_loan,
+            "noi": noi,
+            "cap_rate": cap_rate,
+            "cash_return": cash_return,
+            "property_value": property_value,
+            "quality_score": quality_score
+        }
         
+        # Still part of step 7: step 8 is reported once, after the detailed workbook below
         try:
             # Use the output generator for professional PDF
             pdf_path = output_generator.generate_pdf_package(excel_path)
@@ -679,103 +1174,12 @@ async def process_with_real_components(
                 
         except Exception as e:
             logger.error(f"❌ Error creating professional PDF: {str(e)}")
-            # Create basic PDF using existing code
+            # Create basic PDF without the document summary
             pdf_filename = f"{clean_property_name} Package {timestamp}.pdf"
             pdf_path = f"outputs/{pdf_filename}"
-            
-            # Use the existing PDF creation code
-            from reportlab.lib.pagesizes import letter
-            from reportlab.pdfgen import canvas
-            from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
-            from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Table, TableStyle
-            from reportlab.lib import colors
-            from reportlab.lib.units import inch
-            
-            doc = SimpleDocTemplate(pdf_path, pagesize=letter, 
-                                  rightMargin=72, leftMargin=72, 
-                                  topMargin=72, bottomMargin=18)
-            
-            story = []
-            styles = getSampleStyleSheet()
-            
-            title_style = ParagraphStyle(
-                'CustomTitle',
-                parent=styles['Heading1'],
-                fontSize=24,
-                spaceAfter=30,
-                textColor=colors.darkblue,
-                alignment=1
-            )
-            story.append(Paragraph("Real Estate Underwriting Analysis", title_style))
-            story.append(Spacer(1, 20))
-            
-            property_info_style = ParagraphStyle(
-                'PropertyInfo',
-                parent=styles['Heading2'],
-                fontSize=16,
-                spaceAfter=12,
-                textColor=colors.darkgreen
-            )
-            story.append(Paragraph("Property Information", property_info_style))
-            
-            property_data = [
-                ["Property Name:", property_info.property_name],
-                ["Address:", property_info.property_address],
-                ["Transaction Type:", property_info.transaction_type.title()],
-                ["Analysis Date:", datetime.now().strftime("%B %d, %Y")],
-                ["Bridge Loan:", "Yes" if property_info.is_bridge_loan else "No"]
-            ]
-            
-            property_table = Table(property_data, colWidths=[2*inch, 4*inch])
-            property_table.setStyle(TableStyle([
-                ('BACKGROUND', (0, 0), (0, -1), colors.lightgrey),
-                ('TEXTCOLOR', (0, 0), (-1, -1), colors.black),
-                ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
-                ('FONTNAME', (0, 0), (-1, -1), 'Helvetica'),
-                ('FONTSIZE', (0, 0), (-1, -1), 10),
-                ('BOTTOMPADDING', (0, 0), (-1, -1), 6),
-                ('GRID', (0, 0), (-1, -1), 1, colors.black)
-            ]))
-            story.append(property_table)
-            story.append(Spacer(1, 20))
-            
-            story.append(Paragraph("Financial Summary", property_info_style))
-            
-            financial_data = [
-                ["Net Operating Income:", f"${noi:,.0f}"],
-                ["Cap Rate:", f"{cap_rate:.2f}%"],
-                ["Cash-on-Cash Return:", f"{cash_return:.2f}%"],
-                ["Property Value:", f"${property_value:,.0f}"],
-                ["Quality Score:", f"{quality_score}/100"]
-            ]
-            
-            financial_table = Table(financial_data, colWidths=[2*inch, 4*inch])
-            financial_table.setStyle(TableStyle([
-                ('BACKGROUND', (0, 0), (0, -1), colors.lightblue),
-                ('TEXTCOLOR', (0, 0), (-1, -1), colors.black),
-                ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
-                ('FONTNAME', (0, 0), (-1, -1), 'Helvetica'),
-                ('FONTSIZE', (0, 0), (-1, -1), 10),
-                ('BOTTOMPADDING', (0, 0), (-1, -1), 6),
-                ('GRID', (0, 0), (-1, -1), 1, colors.black)
-            ]))
-            story.append(financial_table)
-            story.append(Spacer(1, 20))
-            
-            doc.build(story)
-        
-        # Create a more detailed demo Excel file
-        import pandas as pd
-        from openpyxl import Workbook
-        from openpyxl.styles import Font, PatternFill
-        
-        wb = Workbook()
+            await loop.run_in_executor(get_process_pool(), build_analysis_pdf, pdf_path, pdf_data)
         
-        # Summary Sheet
-        ws_summary = wb.active
-        ws_summary.title = "Executive Summary"
-        
-        # Property Information
+        # Create a more detailed demo Excel file in the worker pool
         summary_data = [
             ["PROPERTY ANALYSIS SUMMARY", ""],
             ["Property Name", property_info.property_name],
@@ -809,246 +1213,28 @@ async def process_with_real_components(
             ["Review Items", f"{3 - (len(rent_roll_files) + len(t12_files))} items need attention" if quality_score < 80 else "No major issues identified"]
         ]
         
-        for row_num, (label, value) in enumerate(summary_data, 1):
-            ws_summary.cell(row=row_num, column=1, value=label)
-            ws_summary.cell(row=row_num, column=2, value=value)
-            
-            # Style headers
-            if label in ["PROPERTY ANALYSIS SUMMARY", "DOCUMENT SUMMARY", "FINANCIAL SUMMARY", "FLAGS & NOTES"]:
-                cell = ws_summary.cell(row=row_num, column=1)
-                cell.font = Font(bold=True, size=12)
-                cell.fill = PatternFill(start_color="E6E6FA", end_color="E6E6FA", fill_type="solid")
-        
-        # File Details Sheet
-        ws_files = wb.create_sheet("File Details")
-        file_headers = ["File Name", "Type", "Size (MB)", "Status"]
-        
-        for col, header in enumerate(file_headers, 1):
-            cell = ws_files.cell(row=1, column=col, value=header)
-            cell.font = Font(bold=True)
-            cell.fill = PatternFill(start_color="D3D3D3", end_color="D3D3D3", fill_type="solid")
-        
-        row = 2
-        for file_path, file_type in file_type_mapping.items():
-            file_name = os.path.basename(file_path)
-            file_size = os.path.getsize(file_path) / (1024 * 1024)  # MB
-            
-            ws_files.cell(row=row, column=1, value=file_name)
-            ws_files.cell(row=row, column=2, value=file_type.replace('_', ' ').title())
-            ws_files.cell(row=row, column=3, value=f"{file_size:.1f}")
-            ws_files.cell(row=row, column=4, value="Processed")
-            row += 1
-        
-        # Auto-adjust column widths
-        for ws in [ws_summary, ws_files]:
-            for column in ws.columns:
-                max_length = 0
-                column_letter = column[0].column_letter
-                for cell in column:
-                    try:
-                        if len(str(cell.value)) > max_length:
-                            max_length = len(str(cell.value))
-                    except:
-                        pass
-                adjusted_width = min(max_length + 2, 50)
-                ws.column_dimensions[column_letter].width = adjusted_width
-        
-        # Add Rent Roll Simulation Sheet (based on actual property analysis)
-        ws_rentroll = wb.create_sheet("Rent Roll Analysis")
-        
-        # Generate dynamic rent roll data
-        rentroll_headers = ["Unit #", "Unit Type", "Sq Ft", "Current Rent", "Market Rent", "Lease Expiry", "Status"]
-        for col, header in enumerate(rentroll_headers, 1):
-            cell = ws_rentroll.cell(row=1, column=col, value=header)
-            cell.font = Font(bold=True)
-            cell.fill = PatternFill(start_color="90EE90", end_color="90EE90", fill_type="solid")
-        
-        # Generate realistic unit data
-        import random
-        unit_types = ["1BR/1BA", "2BR/2BA", "3BR/2BA", "Studio"]
-        sq_ft_ranges = {"Studio": (450, 600), "1BR/1BA": (650, 850), "2BR/2BA": (900, 1200), "3BR/2BA": (1200, 1600)}
-        
-        total_rent = 0
-        for i in range(1, min(estimated_units + 1, 51)):  # Limit to 50 units for demo
-            unit_type = random.choice(unit_types)
-            sq_ft = random.randint(*sq_ft_ranges[unit_type])
-            base_rent = sq_ft * (1.5 + random.uniform(-0.2, 0.3))  # $1.30-$1.80 per sq ft
-            market_rent = base_rent * random.uniform(1.02, 1.08)  # Market rent slightly higher
-            
-            lease_months = random.randint(1, 18)
-            lease_expiry = (datetime.now() + timedelta(days=lease_months * 30)).strftime("%m/%Y")
-            status = random.choice(["Occupied", "Occupied", "Occupied", "Vacant", "Notice"])
-            
-            if status == "Occupied":
-                total_rent += base_rent
-            
-            row_data = [
-                f"Unit {i:03d}",
-                unit_type,
-                sq_ft,
-                f"${base_rent:,.0f}",
-                f"${market_rent:,.0f}",
-                lease_expiry,
-                status
-            ]
-            
-            for col, value in enumerate(row_data, 1):
-                ws_rentroll.cell(row=i+1, column=col, value=value)
-        
-        # Add Financial Projections Sheet
-        ws_projections = wb.create_sheet("Financial Projections")
-        
-        projections_data = [
-            ["INCOME PROJECTIONS", "", "", "", ""],
-            ["Line Item", "Year 1", "Year 2", "Year 3", "Notes"],
-            ["Gross Potential Rent", f"${gross_potential_income:,.0f}", 
-             f"${gross_potential_income * 1.03:,.0f}", 
-             f"${gross_potential_income * 1.06:,.0f}", "3% annual growth"],
-            ["Vacancy Loss", f"${gross_potential_income * vacancy_factor:,.0f}", 
-             f"${gross_potential_income * 1.03 * vacancy_factor:,.0f}", 
-             f"${gross_potential_income * 1.06 * vacancy_factor:,.0f}", f"{vacancy_factor:.1%} vacancy"],
-            ["Other Income", f"${gross_potential_income * 0.02:,.0f}", 
-             f"${gross_potential_income * 1.03 * 0.02:,.0f}", 
-             f"${gross_potential_income * 1.06 * 0.02:,.0f}", "Parking, fees, etc."],
-            ["Effective Gross Income", f"${effective_gross_income:,.0f}", 
-             f"${effective_gross_income * 1.03:,.0f}", 
-             f"${effective_gross_income * 1.06:,.0f}", ""],
-            ["", "", "", "", ""],
-            ["OPERATING EXPENSES", "", "", "", ""],
-            ["Property Management", f"${effective_gross_income * 0.05:,.0f}", 
-             f"${effective_gross_income * 1.03 * 0.05:,.0f}", 
-             f"${effective_gross_income * 1.06 * 0.05:,.0f}", "5% of EGI"],
-            ["Property Taxes", f"${effective_gross_income * 0.12:,.0f}", 
-             f"${effective_gross_income * 1.03 * 0.12:,.0f}", 
-             f"${effective_gross_income * 1.06 * 0.12:,.0f}", "Market rate"],
-            ["Insurance", f"${effective_gross_income * 0.03:,.0f}", 
-             f"${effective_gross_income * 1.03 * 0.03:,.0f}", 
-             f"${effective_gross_income * 1.06 * 0.03:,.0f}", "Property insurance"],
-            ["Maintenance & Repairs", f"${effective_gross_income * 0.08:,.0f}", 
-             f"${effective_gross_income * 1.03 * 0.08:,.0f}", 
-             f"${effective_gross_income * 1.06 * 0.08:,.0f}", "Regular maintenance"],
-            ["Utilities", f"${effective_gross_income * 0.04:,.0f}", 
-             f"${effective_gross_income * 1.03 * 0.04:,.0f}", 
-             f"${effective_gross_income * 1.06 * 0.04:,.0f}", "Common areas"],
-            ["Other Expenses", f"${effective_gross_income * 0.03:,.0f}", 
-             f"${effective_gross_income * 1.03 * 0.03:,.0f}", 
-             f"${effective_gross_income * 1.06 * 0.03:,.0f}", "Miscellaneous"],
-            ["Total Operating Expenses", f"${operating_expenses:,.0f}", 
-             f"${operating_expenses * 1.03:,.0f}", 
-             f"${operating_expenses * 1.06:,.0f}", ""],
-            ["", "", "", "", ""],
-            ["NET OPERATING INCOME", f"${noi:,.0f}", 
-             f"${noi * 1.03:,.0f}", 
-             f"${noi * 1.06:,.0f}", ""],
-            ["Cash Flow After Debt Service", f"${noi * 0.75:,.0f}", 
-             f"${noi * 1.03 * 0.75:,.0f}", 
-             f"${noi * 1.06 * 0.75:,.0f}", "Assuming 75% leverage"]
-        ]
-        
-        for row_num, row_data in enumerate(projections_data, 1):
-            for col_num, value in enumerate(row_data, 1):
-                cell = ws_projections.cell(row=row_num, column=col_num, value=value)
-                if row_num == 1 or "INCOME PROJECTIONS" in str(value) or "OPERATING EXPENSES" in str(value):
-                    cell.font = Font(bold=True)
-                    cell.fill = PatternFill(start_color="FFFF99", end_color="FFFF99", fill_type="solid")
-        
-        wb.save(excel_path)
+        excel_data = {
+            "summary_data": summary_data,
+            "file_type_mapping": file_type_mapping,
+            "file_sizes": file_sizes or {},
+            "session_id": session_id,
+            "estimated_units": estimated_units,
+            "gross_potential_income": gross_potential_income,
+            "vacancy_factor": vacancy_factor,
+            "effective_gross_income": effective_gross_income,
+            "operating_expenses": operating_expenses,
+            "noi": noi
+        }
+        await loop.run_in_executor(get_process_pool(), build_analysis_excel, excel_path, excel_data)
         
-        # Step 7: PDF Generation
-        update_progress(session_id, 7, "PDF Generation", "Creating lender-ready PDF package...")
-        await asyncio.sleep(1.5)
+        # Step 8: Detailed PDF Generation
+        await update_progress(session_id, 8, "PDF Generation", "Creating lender-ready PDF package...")
         
         # Create demo PDF path with cleaner filename
         pdf_filename = f"{clean_property_name} Package {timestamp}.pdf"
         pdf_path = f"outputs/{pdf_filename}"
         
-        # Create a proper PDF file using reportlab
-        from reportlab.lib.pagesizes import letter
-        from reportlab.pdfgen import canvas
-        from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
-        from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Table, TableStyle
-        from reportlab.lib import colors
-        from reportlab.lib.units import inch
-        
-        # Create PDF document
-        doc = SimpleDocTemplate(pdf_path, pagesize=letter, 
-                              rightMargin=72, leftMargin=72, 
-                              topMargin=72, bottomMargin=18)
-        
-        # Build PDF content
-        story = []
-        styles = getSampleStyleSheet()
-        
-        # Title
-        title_style = ParagraphStyle(
-            'CustomTitle',
-            parent=styles['Heading1'],
-            fontSize=24,
-            spaceAfter=30,
-            textColor=colors.darkblue,
-            alignment=1  # Center alignment
-        )
-        story.append(Paragraph("Real Estate Underwriting Analysis", title_style))
-        story.append(Spacer(1, 20))
-        
-        # Property Information
-        property_info_style = ParagraphStyle(
-            'PropertyInfo',
-            parent=styles['Heading2'],
-            fontSize=16,
-            spaceAfter=12,
-            textColor=colors.darkgreen
-        )
-        story.append(Paragraph("Property Information", property_info_style))
-        
-        property_data = [
-            ["Property Name:", property_info.property_name],
-            ["Address:", property_info.property_address],
-            ["Transaction Type:", property_info.transaction_type.title()],
-            ["Analysis Date:", datetime.now().strftime("%B %d, %Y")],
-            ["Bridge Loan:", "Yes" if property_info.is_bridge_loan else "No"]
-        ]
-        
-        property_table = Table(property_data, colWidths=[2*inch, 4*inch])
-        property_table.setStyle(TableStyle([
-            ('BACKGROUND', (0, 0), (0, -1), colors.lightgrey),
-            ('TEXTCOLOR', (0, 0), (-1, -1), colors.black),
-            ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
-            ('FONTNAME', (0, 0), (-1, -1), 'Helvetica'),
-            ('FONTSIZE', (0, 0), (-1, -1), 10),
-            ('BOTTOMPADDING', (0, 0), (-1, -1), 6),
-            ('GRID', (0, 0), (-1, -1), 1, colors.black)
-        ]))
-        story.append(property_table)
-        story.append(Spacer(1, 20))
-        
-        # Financial Summary
-        story.append(Paragraph("Financial Summary", property_info_style))
-        
-        financial_data = [
-            ["Net Operating Income:", f"${noi:,.0f}"],
-            ["Cap Rate:", f"{cap_rate:.2f}%"],
-            ["Cash-on-Cash Return:", f"{cash_return:.2f}%"],
-            ["Property Value:", f"${property_value:,.0f}"],
-            ["Quality Score:", f"{quality_score}/100"]
-        ]
-        
-        financial_table = Table(financial_data, colWidths=[2*inch, 4*inch])
-        financial_table.setStyle(TableStyle([
-            ('BACKGROUND', (0, 0), (0, -1), colors.lightblue),
-            ('TEXTCOLOR', (0, 0), (-1, -1), colors.black),
-            ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
-            ('FONTNAME', (0, 0), (-1, -1), 'Helvetica'),
-            ('FONTSIZE', (0, 0), (-1, -1), 10),
-            ('BOTTOMPADDING', (0, 0), (-1, -1), 6),
-            ('GRID', (0, 0), (-1, -1), 1, colors.black)
-        ]))
-        story.append(financial_table)
-        story.append(Spacer(1, 20))
-        
-        # File Analysis Summary
-        story.append(Paragraph("Document Analysis", property_info_style))
-        
+        # Document summary for the PDF
         doc_summary = f"Analysis completed on {len(uploaded_files)} uploaded documents:"
         if rent_roll_files:
             doc_summary += f"\n• {len(rent_roll_files)} Rent Roll document(s)"
@@ -1057,16 +1243,8 @@ async def process_with_real_components(
         if additional_files:
             doc_summary += f"\n• {len(additional_files)} Additional supporting document(s)"
         
-        story.append(Paragraph(doc_summary, styles['Normal']))
-        story.append(Spacer(1, 20))
-        
-        # Footer
-        footer_text = "This analysis was generated by the Real Estate Underwriting AI System. " \
-                     "For questions or additional analysis, please contact your underwriting team."
-        story.append(Paragraph(footer_text, styles['Italic']))
-        
-        # Build PDF
-        doc.build(story)
+        pdf_data["doc_summary"] = doc_summary
+        await loop.run_in_executor(get_process_pool(), build_analysis_pdf, pdf_path, pdf_data)
         
         # Complete processing
         session.status = "completed"
@@ -1113,10 +1291,12 @@ async def process_with_real_components(
             },
             "excel_path": excel_path,
             "pdf_path": pdf_path,
+            "pdf_base_name": os.path.splitext(pdf_path)[0],
             "flags_count": len(summary.get('flags_and_recommendations', [])),
             "processing_time": datetime.now().isoformat(),
             "analysis_success": True
         }
+        await processing_sessions.save(session)
         
         logger.info(f"✅ Real document processing completed for session {session_id}")
         logger.info(f"   - Processed {len(uploaded_files)} files")
@@ -1129,36 +1309,102 @@ async def process_with_real_components(
         import traceback
         traceback.print_exc()
         
-        session = processing_sessions[session_id]
+        session = await processing_sessions.get(session_id)
         session.status = "error"
         session.error_message = str(e)
         session.message = f"Real processing failed: {str(e)}"
         session.current_step = 0
         session.progress_percentage = 0.0
+        await processing_sessions.save(session)
 
-def update_progress(session_id: str, step: int, step_name: str, message: str):
-    """Update processing progress for a session."""
-    if session_id in processing_sessions:
-        session = processing_sessions[session_id]
-        session.current_step = step
-        session.total_steps = 8
-        session.step_name = step_name
-        session.progress_percentage = (step / 8) * 100
-        session.message = message
-        logger.info(f"📊 Session {session_id}: Step {step}/8 - {step_name}")
+async def update_progress(session_id: str, step: int, step_name: str, message: str):
+    """Update processing progress for a session (sessions that were removed are skipped)."""
+    # Partial update so only the progress fields are rewritten
+    await processing_sessions.update(
+        session_id,
+        current_step=step,
+        total_steps=8,
+        step_name=step_name,
+        progress_percentage=(step / 8) * 100,
+        message=message
+    )
+    logger.info(f"📊 Session {session_id}: Step {step}/8 - {step_name}")
 
 @app.get("/api/health")
 async def health_check():
     """Health check endpoint."""
     return {"status": "healthy", "timestamp": datetime.now().isoformat()}
 
+def remove_expired_files(max_age_seconds: float):
+    """Delete finished session uploads and generated outputs older than max_age_seconds.
+    
+    Returns the number of entries removed and the ids of the sessions whose uploads
+    went with them. Those sessions are dropped by the caller on the event loop, where
+    the store's change notifications are delivered.
+    """
+    cutoff = datetime.now().timestamp() - max_age_seconds
+    removed = 0
+    expired_sessions = []
+    
+    # Session upload directories: only once processing has finished (or the session is gone)
+    if os.path.isdir("uploads"):
+        with os.scandir("uploads") as entries:
+            for entry in entries:
+                if not entry.is_dir() or entry.stat().st_mtime >= cutoff:
+                    continue
+                session = processing_sessions.get_sync(entry.name)
+                if session is not None and session.status not in ("completed", "error"):
+                    continue
+                shutil.rmtree(entry.path, ignore_errors=True)
+                if session is not None:
+                    expired_sessions.append(entry.name)
+                removed += 1
+    
+    # Generated Excel/PDF files
+    if os.path.isdir("outputs"):
+        with os.scandir("outputs") as entries:
+            for entry in entries:
+                if entry.is_file() and entry.stat().st_mtime < cutoff:
+                    try:
+                        os.remove(entry.path)
+                        removed += 1
+                    except OSError:
+                        pass
+    
+    return removed, expired_sessions
+
+async def cleanup_expired_files():
+    """Periodically remove old uploads and outputs so disk usage stays bounded."""
+    loop = asyncio.get_running_loop()
+    while True:
+        await asyncio.sleep(CLEANUP_INTERVAL_SECONDS)
+        try:
+            # The directory walk runs in a thread so it never blocks the event loop
+            removed, expired_sessions = await loop.run_in_executor(None, remove_expired_files, FILE_RETENTION_HOURS * 3600)
+            for session_id in expired_sessions:
+                # Already gone when it was removed through /api/cleanup
+                await processing_sessions.delete(session_id)
+            if removed:
+                logger.info(f"🧹 Removed {removed} expired upload/output entries")
+        except Exception as e:
+            logger.error(f"❌ Cleanup of expired files failed: {str(e)}")
+
+@app.on_event("startup")
+async def start_cleanup_task():
+    """Start the periodic uploads/outputs cleanup."""
+    asyncio.create_task(cleanup_expired_files())
+
+@app.on_event("shutdown")
+async def stop_process_pool():
+    """Shut down the process pool, if it was started."""
+    if _process_pool is not None:
+        _process_pool.shutdown(cancel_futures=True)
+
 # Cleanup endpoint for development
 @app.delete("/api/cleanup/{session_id}")
 async def cleanup_session(session_id: str):
     """Clean up session data (development only)."""
-    if session_id in processing_sessions:
-        del processing_sessions[session_id]
-        
+    if await processing_sessions.delete(session_id):
         # Clean up files
         session_dir = f"uploads/{session_id}"
         if os.path.exists(session_dir):
@@ -1168,6 +1414,131 @@ async def cleanup_session(session_id: str):
     
     raise HTTPException(status_code=404, detail="Session not found")
 
+# Linux ioctl that shares the source extents with the destination (reflink) on CoW filesystems
+FICLONE = 0x40049409
+
+def try_clone_extents(src_fd: int, dst_fd: int) -> bool:
+    """Reflink src into dst with FICLONE (btrfs/XFS); False when the filesystem can't."""
+    if sys.platform != "linux":
+        return False
+    try:
+        import fcntl
+        fcntl.ioctl(dst_fd, FICLONE, src_fd)
+        return True
+    except OSError:
+        # EXDEV, EOPNOTSUPP, EINVAL, ... - no reflink support for this pair
+        return False
+
+def copy_fd_range(copy_chunk, src_fd: int, dst_fd: int, offset: int, size: int) -> int:
+    """Copy with copy_file_range/sendfile from offset until size; returns the offset reached."""
+    try:
+        while offset < size:
+            copied = copy_chunk(src_fd, dst_fd, offset, size - offset)
+            if copied == 0:
+                break
+            offset += copied
+    except OSError as e:
+        if e.errno not in (errno.ENOSYS, errno.EINVAL, errno.EXDEV, errno.EOPNOTSUPP):
+            raise
+    return offset
+
+def fast_clone(src: str, dst: str):
+    """Copy src to dst with as little data movement as the kernel allows.
+    
+    Tries a FICLONE reflink first (O(1) on CoW filesystems), then
+    os.copy_file_range (in-kernel, server-side on NFSv4.2), then os.sendfile,
+    and finishes any remainder with a plain read/write loop. Metadata is
+    copied afterwards like shutil.copy2 does.
+    """
+    src_fd = os.open(src, os.O_RDONLY)
+    try:
+        dst_fd = os.open(dst, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o644)
+        try:
+            if not try_clone_extents(src_fd, dst_fd):
+                size = os.fstat(src_fd).st_size
+                offset = 0
+                if hasattr(os, "copy_file_range"):
+                    offset = copy_fd_range(
+                        lambda s, d, off, count: os.copy_file_range(s, d, count, off, off),
+                        src_fd, dst_fd, offset, size
+                    )
+                if offset < size and hasattr(os, "sendfile"):
+                    offset = copy_fd_range(
+                        lambda s, d, off, count: os.sendfile(d, s, off, count),
+                        src_fd, dst_fd, offset, size
+                    )
+                # Whatever the kernel couldn't copy for us, through one reused buffer
+                os.lseek(src_fd, offset, os.SEEK_SET)
+                os.lseek(dst_fd, offset, os.SEEK_SET)
+                buffer = bytearray(COPY_BUFFER_SIZE)
+                view = memoryview(buffer)
+                while count := os.readv(src_fd, [buffer]):
+                    written = 0
+                    while written < count:
+                        written += os.write(dst_fd, view[written:count])
+        finally:
+            os.close(dst_fd)
+    finally:
+        os.close(src_fd)
+    shutil.copystat(src, dst)
+
+def annotate_pdf(pdf_path: str, updated_pdf_path: str, notes: str) -> bool:
+    """Write pdf_path to updated_pdf_path with the notes as a text annotation on the last page.
+    
+    Uses pikepdf (QPDF) when installed so the notes end up in the PDF itself;
+    returns False when it isn't available and the caller should copy instead.
+    """
+    try:
+        import pikepdf
+    except ImportError:
+        return False
+    
+    with pikepdf.Pdf.open(pdf_path) as pdf:
+        page = pdf.pages[-1]
+        page = getattr(page, "obj", page)
+        annotation = pdf.make_indirect(pikepdf.Dictionary(
+            Type=pikepdf.Name.Annot,
+            Subtype=pikepdf.Name.Text,
+            Rect=[36, 36, 60, 60],
+            T=pikepdf.String("Underwriting Notes"),
+            Contents=pikepdf.String(notes),
+            Open=False
+        ))
+        if "/Annots" in page:
+            page.Annots.append(annotation)
+        else:
+            page.Annots = pikepdf.Array([annotation])
+        # Single pass from the original to the new file, no intermediate copy
+        pdf.save(updated_pdf_path, linearize=False)
+    return True
+
+def write_updated_pdf(pdf_path: str, updated_pdf_path: str, notes: str):
+    """Produce the updated PDF package: annotated when possible, otherwise a fast copy.
+    
+    The file is written to a temporary path, flushed to disk and then renamed over
+    updated_pdf_path, so a crash never leaves a half-written package behind.
+    """
+    tmp_path = f"{updated_pdf_path}.tmp"
+    try:
+        if not annotate_pdf(pdf_path, tmp_path, notes):
+            fast_clone(pdf_path, tmp_path)
+        
+        fd = os.open(tmp_path, os.O_RDONLY)
+        try:
+            os.fsync(fd)
+            # One-shot large copy: drop it from the page cache so it doesn't push out the originals
+            if os.fstat(fd).st_size > DROP_CACHE_MIN_BYTES and hasattr(os, "posix_fadvise"):
+                os.posix_fadvise(fd, 0, 0, os.POSIX_FADV_DONTNEED)
+        finally:
+            os.close(fd)
+        os.replace(tmp_path, updated_pdf_path)
+    except BaseException:
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+        raise
+
 @app.post("/api/update-pdf/{session_id}")
 async def update_pdf_content(
     session_id: str,
@@ -1177,11 +1548,11 @@ async def update_pdf_content(
     """
     Update PDF package with additional notes or pages before download.
     """
-    if session_id not in processing_sessions:
+    # One lookup (a single HGETALL when sessions live in Redis)
+    session_status = await processing_sessions.get(session_id)
+    if session_status is None:
         raise HTTPException(status_code=404, detail="Session not found")
     
-    session_status = processing_sessions[session_id]
-    
     if session_status.status != "completed":
         raise HTTPException(status_code=400, detail="Analysis not completed yet")
     
@@ -1194,22 +1565,29 @@ async def update_pdf_content(
             # For demo, create an updated PDF with notes
             if pdf_notes:
                 # Create updated filename
-                base_name = os.path.splitext(pdf_path)[0]
+                base_name = results.get("pdf_base_name") or os.path.splitext(pdf_path)[0]
                 updated_pdf_path = f"{base_name}_Updated.pdf"
                 
-                # In a real implementation, you would modify the PDF content here
-                # For demo, just copy and rename
-                shutil.copy2(pdf_path, updated_pdf_path)
+                # Add the notes to the PDF itself (or copy it without pikepdf) in a
+                # thread so large files don't block the event loop
+                loop = asyncio.get_running_loop()
+                await loop.run_in_executor(None, write_updated_pdf, pdf_path, updated_pdf_path, pdf_notes)
                 
-                # Update the results with new path
-                session_status.results["pdf_path"] = updated_pdf_path
-                session_status.results["pdf_updated"] = True
-                session_status.results["update_notes"] = pdf_notes
+                # Update the results with new path in one store write
+                updates = {
+                    "pdf_path": updated_pdf_path,
+                    "pdf_base_name": f"{base_name}_Updated",
+                    "pdf_updated": True,
+                    "update_notes": pdf_notes
+                }
+                session_status.results.update(updates)
+                await processing_sessions.update(session_id, results=session_status.results)
         
         return {
             "message": "PDF updated successfully",
             "session_id": session_id,
             "pdf_path": session_status.results.get("pdf_path", ""),
+            "download_url": f"/api/download/{session_id}/pdf",
             "updated": True
         }
         
@@ -1219,14 +1597,25 @@ async def update_pdf_content(
 if __name__ == "__main__":
     import uvicorn
     
-    # Ensure required directories exist
-    os.makedirs("uploads", exist_ok=True)
-    os.makedirs("outputs", exist_ok=True)
-    os.makedirs("static", exist_ok=True)
-    os.makedirs("templates", exist_ok=True)
-    
     print("🚀 Starting Real Estate Underwriting AI Server...")
     print("📊 Access the application at: http://localhost:8001")
     print("🎯 Now using REAL PDF processing - uploads will take longer but extract actual data")
     
-    uvicorn.run(app, host="0.0.0.0", port=8001, reload=False)
+    # Several workers only when sessions are shared through Redis; in-memory
+    # sessions would otherwise be split between the worker processes
+    workers = int(os.getenv("WEB_CONCURRENCY", os.cpu_count() or 1)) if processing_sessions.redis else 1
+    print(f"⚙️ Starting {workers} worker(s)")
+    # Read back by each worker to size its share of the process pool
+    os.environ["WEB_CONCURRENCY"] = str(workers)
+    
+    # "auto" picks uvloop and httptools when installed (uvicorn[standard])
+    uvicorn.run(
+        "app_demo:app",
+        host="0.0.0.0",
+        port=8001,
+        reload=False,
+        workers=workers,
+        loop="auto",
+        http="auto",
+        log_level="warning"
+    )
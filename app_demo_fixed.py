@@ -4,9 +4,9 @@ FastAPI Underwriting Application - Fixed Version
 Modern web interface for real estate underwriting with dynamic uploads and progress tracking.
 """
 
-from fastapi import FastAPI, File, UploadFile, HTTPException, BackgroundTasks, Form
+from fastapi import FastAPI, File, UploadFile, HTTPException, BackgroundTasks, Form, Request, WebSocket, WebSocketDisconnect
 from fastapi.staticfiles import StaticFiles
-from fastapi.responses import HTMLResponse, JSONResponse, FileResponse
+from fastapi.responses import HTMLResponse, JSONResponse, FileResponse, StreamingResponse, Response
 from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel
 from typing import List, Optional, Dict, Any
@@ -14,10 +14,26 @@ import os
 import uuid
 import json
 import asyncio
+import hashlib
 import shutil
+import subprocess
+import aiofiles
+import aiofiles.os
+import numpy as np
+from streaming_form_data import StreamingFormDataParser
+from streaming_form_data.targets import ListTarget, ValueTarget
+from concurrent.futures import ProcessPoolExecutor
+from collections import Counter, OrderedDict
+from dataclasses import dataclass
 from datetime import datetime, timedelta
 import logging
 import csv
+import io
+import re
+from urllib.parse import quote
+from session_store import SessionStore, status_encoder
+from file_utils import link_or_copy
+from upload_target import UploadedFilesTarget, invalid_file_types, safe_filename
 
 # Try to import the real processing components
 try:
@@ -31,6 +47,82 @@ except ImportError as e:
     print(f"⚠️ Real processing components not available: {e}")
     print("🔄 Will use fallback processing mode")
 
+# Underwriting report template, read once at import (None if the file is missing)
+UNDERWRITING_TEMPLATE_PATH = "templates/underwriting_template.html"
+try:
+    with open(UNDERWRITING_TEMPLATE_PATH, "r", encoding="utf-8") as f:
+        UNDERWRITING_TEMPLATE = f.read()
+except FileNotFoundError:
+    UNDERWRITING_TEMPLATE = None
+
+# Matches the {{key}} placeholders of the report template for the non-Jinja fallback
+TEMPLATE_PLACEHOLDER_PATTERN = re.compile(r"\{\{(\w+)\}\}")
+
+# Jinja2 renders the HTML report template in one pass; without it the template is
+# filled from these segments, split once here: [literal, key, literal, key, ..., literal]
+UNDERWRITING_SEGMENTS = TEMPLATE_PLACEHOLDER_PATTERN.split(UNDERWRITING_TEMPLATE) if UNDERWRITING_TEMPLATE else None
+
+try:
+    from jinja2 import Environment, DebugUndefined
+    template_env = Environment(
+        auto_reload=False,
+        keep_trailing_newline=True,
+        undefined=DebugUndefined
+    )
+    # Compiled once from the template text loaded above
+    underwriting_template = template_env.from_string(UNDERWRITING_TEMPLATE) if UNDERWRITING_TEMPLATE else None
+except ImportError:
+    template_env = None
+    underwriting_template = None
+    print("⚠️ jinja2 not available - using string replacement for HTML templates")
+
+# The report's <style> block is parsed into a WeasyPrint stylesheet once and stripped from
+# the HTML handed to WeasyPrint; the saved HTML file keeps it so it stays self-contained
+REPORT_STYLE_MATCH = re.search(r"<style>(.*?)</style>", UNDERWRITING_TEMPLATE or "", re.S)
+REPORT_STYLE_BLOCK = REPORT_STYLE_MATCH.group(0) if REPORT_STYLE_MATCH else None
+
+# Screen-only assets the PDF converters would still fetch or tokenize: scripts and
+# bundle/analytics stylesheets. Checked once here so templates without them cost nothing
+PDF_SCREEN_ASSETS_PATTERN = re.compile(
+    r'<script\b[^>]*>.*?</script>|<link[^>]+href="[^"]*(?:bootstrap|bundle|analytics)[^"]*"[^>]*>',
+    re.S | re.I
+)
+REPORT_HAS_SCREEN_ASSETS = bool(UNDERWRITING_TEMPLATE and PDF_SCREEN_ASSETS_PATTERN.search(UNDERWRITING_TEMPLATE))
+
+# WeasyPrint fonts and stylesheet are set up once (per pool worker) and reused for every PDF
+try:
+    import weasyprint
+    from weasyprint.text.fonts import FontConfiguration
+    FONT_CONFIG = FontConfiguration()
+    REPORT_CSS = weasyprint.CSS(string=REPORT_STYLE_MATCH.group(1), font_config=FONT_CONFIG) if REPORT_STYLE_MATCH else None
+except (ImportError, OSError) as e:
+    weasyprint = None
+    FONT_CONFIG = None
+    REPORT_CSS = None
+    print(f"⚠️ WeasyPrint not available: {e}")
+
+# The other PDF converters are looked up once as well
+WKHTMLTOPDF_PATH = shutil.which("wkhtmltopdf")
+try:
+    import pdfkit
+except ImportError:
+    pdfkit = None
+
+# Page setup shared by wkhtmltopdf and pdfkit
+WKHTMLTOPDF_OPTIONS = {
+    'page-size': 'A4',
+    'orientation': 'Landscape',
+    'margin-top': '0.5in',
+    'margin-right': '0.5in',
+    'margin-bottom': '0.5in',
+    'margin-left': '0.5in',
+}
+
+# Rendered PDFs are cached by a hash of their HTML; least recently used entries are
+# evicted once the cache grows past PDF_CACHE_MAX_BYTES
+PDF_CACHE_DIR = "outputs/cache"
+PDF_CACHE_MAX_BYTES = 512 * 1024 * 1024
+
 # FastAPI app initialization
 app = FastAPI(
     title="Real Estate Underwriting AI",
@@ -50,8 +142,123 @@ app.add_middleware(
 # Static files
 app.mount("/static", StaticFiles(directory="static"), name="static")
 
-# In-memory storage for processing status (in production, use Redis/database)
-processing_sessions = {}
+# Extracted tables kept in memory for streaming CSV downloads: session_id -> {"rent_roll"/"t12": DataFrame},
+# least recently used first. Capped per worker; evicted tables are served from the CSV written to disk
+EXTRACTED_TABLES_MAX_SESSIONS = int(os.getenv("EXTRACTED_TABLES_MAX_SESSIONS", "16"))
+extracted_tables: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+
+def remember_tables(session_id: str, tables: Dict[str, Any]):
+    """Keep a session's extracted tables for streaming, evicting the least recently used sessions."""
+    extracted_tables[session_id] = tables
+    extracted_tables.move_to_end(session_id)
+    while len(extracted_tables) > EXTRACTED_TABLES_MAX_SESSIONS:
+        extracted_tables.popitem(last=False)
+
+# DataFrame rows encoded per chunk when streaming a CSV
+CSV_STREAM_ROWS = 1000
+
+def prewarm_pdf_worker():
+    """Pool worker initializer: render a tiny document so the first real PDF doesn't
+    pay for WeasyPrint's font scan and Pango/Cairo start-up."""
+    if weasyprint is None:
+        return
+    try:
+        stylesheets = [REPORT_CSS] if REPORT_CSS is not None else None
+        weasyprint.HTML(string="<p>warm-up</p>").write_pdf(stylesheets=stylesheets, font_config=FONT_CONFIG)
+    except Exception as e:
+        logger.warning(f"⚠️ WeasyPrint warm-up failed: {e}")
+
+# Processes in the CPU pool: PROCESS_POOL_WORKERS when set, otherwise the CPUs split
+# between the WEB_CONCURRENCY uvicorn workers so together they don't oversubscribe the host
+PROCESS_POOL_WORKERS = int(os.getenv("PROCESS_POOL_WORKERS", "0")) or max(
+    1, (os.cpu_count() or 1) // int(os.getenv("WEB_CONCURRENCY", "1"))
+)
+
+# Worker pool for CPU-bound PDF table extraction and report rendering, keeping the
+# event loop and GIL free; workers share the fonts and stylesheet set up above.
+# Created on first use so importing the app doesn't start (and pre-warm) any processes.
+_process_pool: Optional[ProcessPoolExecutor] = None
+
+def get_process_pool() -> ProcessPoolExecutor:
+    """Return the shared process pool, starting it on first use."""
+    global _process_pool
+    if _process_pool is None:
+        _process_pool = ProcessPoolExecutor(max_workers=PROCESS_POOL_WORKERS, initializer=prewarm_pdf_worker)
+    return _process_pool
+
+@app.on_event("shutdown")
+async def stop_process_pool():
+    """Shut down the process pool, if it was started."""
+    if _process_pool is not None:
+        _process_pool.shutdown(cancel_futures=True)
+
+# DocumentProcessor of the current pool worker, created on its first document
+document_processor = None
+
+# Report template amounts as (placeholder, base figure, ratio); bases are gross potential
+# income, effective gross income, operating expenses and NOI
+TEMPLATE_BASES = {"gpi": 0, "egi": 1, "opex": 2, "noi": 3}
+TEMPLATE_AMOUNTS = (
+    ('cost_basis', 'gpi', 8), ('property_value', 'gpi', 10), ('loan_amount', 'noi', 12.5),
+    # Revenue - T-12
+    ('t12_rental_income', 'gpi', 0.92), ('t12_admin_income', 'gpi', 0.01), ('t12_laundry', 'gpi', 0.009),
+    ('t12_rubs', 'gpi', 0.054), ('t12_gpi', 'gpi', 1), ('t12_egi', 'egi', 0.99),
+    # Revenue - T-5 (recent trending)
+    ('t5_rental_income', 'gpi', 0.38), ('t5_annualized_rental', 'gpi', 0.96),
+    ('t5_admin_income', 'gpi', 0.004), ('t5_annualized_admin', 'gpi', 0.0095),
+    ('t5_laundry', 'gpi', 0.0036), ('t5_annualized_laundry', 'gpi', 0.0087),
+    ('t5_rubs', 'gpi', 0.023), ('t5_annualized_rubs', 'gpi', 0.055),
+    ('t5_gpi', 'gpi', 0.406), ('t5_annualized_gpi', 'gpi', 0.976),
+    ('t5_egi', 'egi', 0.406), ('t5_annualized_egi', 'egi', 0.97),
+    # Revenue - UW (Underwritten)
+    ('uw_rental_income', 'gpi', 0.928), ('uw_admin_income', 'gpi', 0.0078), ('uw_laundry', 'gpi', 0.0087),
+    ('uw_rubs', 'gpi', 0.0553), ('uw_gpi', 'gpi', 1), ('uw_egi', 'egi', 1),
+    # Expenses - Fixed
+    ('t12_taxes', 'opex', 0.17), ('t12_insurance', 'opex', 0.052), ('t12_fixed_total', 'opex', 0.22),
+    ('t5_taxes', 'opex', 0.07), ('t5_annualized_taxes', 'opex', 0.168),
+    ('t5_insurance', 'opex', 0.022), ('t5_annualized_insurance', 'opex', 0.052),
+    ('t5_fixed_total', 'opex', 0.092), ('t5_annualized_fixed', 'opex', 0.22),
+    ('uw_taxes', 'opex', 0.48), ('uw_insurance', 'opex', 0.053), ('uw_fixed_total', 'opex', 0.533),
+    # NOI, cash flow and debt service
+    ('t12_noi', 'noi', 1.097), ('t5_noi', 'noi', 0.481), ('t5_annualized_noi', 'noi', 1.154), ('uw_noi', 'noi', 1),
+    ('t12_cash_flow', 'noi', 1.097), ('t5_cash_flow', 'noi', 0.481), ('t5_annualized_cash_flow', 'noi', 1.154),
+    ('debt_service', 'noi', 0.978),
+)
+# Per-unit amounts: base figure times ratio, divided by the unit count
+TEMPLATE_PER_UNIT_AMOUNTS = (
+    ('t12_rental_per_unit', 'gpi', 0.92), ('t12_admin_per_unit', 'gpi', 0.01), ('t12_laundry_per_unit', 'gpi', 0.009),
+    ('t12_rubs_per_unit', 'gpi', 0.054), ('t12_gpi_per_unit', 'gpi', 1), ('t12_egi_per_unit', 'egi', 0.99),
+    ('t5_rental_per_unit', 'gpi', 0.96), ('t5_admin_per_unit', 'gpi', 0.0095), ('t5_laundry_per_unit', 'gpi', 0.0087),
+    ('t5_rubs_per_unit', 'gpi', 0.055), ('t5_gpi_per_unit', 'gpi', 0.976), ('t5_egi_per_unit', 'egi', 0.97),
+    ('uw_rental_per_unit', 'gpi', 0.928), ('uw_admin_per_unit', 'gpi', 0.0078), ('uw_laundry_per_unit', 'gpi', 0.0087),
+    ('uw_rubs_per_unit', 'gpi', 0.0553), ('uw_gpi_per_unit', 'gpi', 1), ('uw_egi_per_unit', 'egi', 1),
+    ('t12_taxes_per_unit', 'opex', 0.17), ('t12_insurance_per_unit', 'opex', 0.052), ('t12_fixed_per_unit', 'opex', 0.22),
+    ('t5_taxes_per_unit', 'opex', 0.168), ('t5_insurance_per_unit', 'opex', 0.052), ('t5_fixed_per_unit', 'opex', 0.22),
+    ('uw_taxes_per_unit', 'opex', 0.48), ('uw_insurance_per_unit', 'opex', 0.053), ('uw_fixed_per_unit', 'opex', 0.533),
+    ('t12_noi_per_unit', 'noi', 1.097), ('t5_noi_per_unit', 'noi', 1.154), ('uw_noi_per_unit', 'noi', 1),
+    ('t12_cash_flow_per_unit', 'noi', 1.097), ('t5_cash_flow_per_unit', 'noi', 1.154),
+)
+AMOUNT_KEYS = [key for key, _, _ in TEMPLATE_AMOUNTS]
+AMOUNT_BASES = np.array([TEMPLATE_BASES[base] for _, base, _ in TEMPLATE_AMOUNTS])
+AMOUNT_RATIOS = np.array([ratio for _, _, ratio in TEMPLATE_AMOUNTS], dtype=float)
+PER_UNIT_KEYS = [key for key, _, _ in TEMPLATE_PER_UNIT_AMOUNTS]
+PER_UNIT_BASES = np.array([TEMPLATE_BASES[base] for _, base, _ in TEMPLATE_PER_UNIT_AMOUNTS])
+PER_UNIT_RATIOS = np.array([ratio for _, _, ratio in TEMPLATE_PER_UNIT_AMOUNTS], dtype=float)
+
+# Names of the analysis/output steps reported through update_progress
+STEP_NAMES = {
+    3: "Rent Roll Analysis",
+    4: "T12 Analysis",
+    5: "Underwriting Summary",
+    6: "Excel Generation",
+    7: "PDF Generation"
+}
+
+# Bytes read from an upload per chunk while saving it to disk
+UPLOAD_CHUNK_SIZE = 1024 * 1024
+
+# Maximum number of uploaded files written to disk at the same time
+UPLOAD_SAVE_CONCURRENCY = 4
 
 # Models for API requests/responses
 class ProcessingStatus(BaseModel):
@@ -65,6 +272,35 @@ class ProcessingStatus(BaseModel):
     results: Optional[Dict[str, Any]] = None
     error_message: Optional[str] = None
 
+# Stored session state; ProcessingStatus above describes the same fields for the API
+@dataclass(slots=True)
+class ProcessingStatusRecord:
+    session_id: str
+    status: str
+    current_step: int
+    total_steps: int
+    step_name: str
+    progress_percentage: float
+    message: str
+    results: Optional[Dict[str, Any]] = None
+    error_message: Optional[str] = None
+
+# Processing status storage: in-memory by default, shared via Redis when REDIS_URL is set
+processing_sessions = SessionStore(ProcessingStatusRecord, redis_url=os.getenv("REDIS_URL"))
+
+# Live progress subscribers: session_id -> queues of connected /ws/status clients
+progress_subscribers: Dict[str, List[asyncio.Queue]] = {}
+
+# Seconds between keep-alive checks on an idle progress socket
+PROGRESS_STREAM_KEEPALIVE = 15
+
+def notify_progress_subscribers(session_id: str):
+    """Wake up every socket client watching this session."""
+    for queue in progress_subscribers.get(session_id, ()):
+        queue.put_nowait(True)
+
+processing_sessions.on_change = notify_progress_subscribers
+
 class PropertyInfo(BaseModel):
     property_name: str
     property_address: str
@@ -81,7 +317,100 @@ async def read_root():
     return FileResponse("templates/index.html")
 
 @app.post("/api/upload")
-async def upload_documents(
+async def upload_documents(request: Request, background_tasks: BackgroundTasks):
+    """
+    Upload documents and start processing in background.
+    Returns session ID for tracking progress.
+    
+    The multipart body is parsed as it streams in, so each file is written
+    to disk chunk by chunk instead of being spooled to a temp file first.
+    """
+    # Generate unique session ID
+    session_id = str(uuid.uuid4())
+    
+    # Create session directory
+    session_dir = f"uploads/{session_id}"
+    os.makedirs(session_dir, exist_ok=True)
+    
+    # Register form fields and stream the request body through the parser
+    property_name_target = ValueTarget()
+    property_address_target = ValueTarget()
+    transaction_type_target = ValueTarget()
+    bridge_loan_target = ValueTarget()
+    file_types_target = ListTarget(str)
+    files_target = UploadedFilesTarget(session_dir, UPLOAD_CHUNK_SIZE)
+    
+    parsed = False
+    try:
+        parser = StreamingFormDataParser(headers=request.headers)
+        parser.register("property_name", property_name_target)
+        parser.register("property_address", property_address_target)
+        parser.register("transaction_type", transaction_type_target)
+        parser.register("is_bridge_loan", bridge_loan_target)
+        parser.register("file_types", file_types_target)
+        parser.register("files", files_target)
+        
+        async for chunk in request.stream():
+            await parser.adata_received(chunk)
+        if files_target.receiving:
+            raise ValueError("request body ended in the middle of a file")
+        parsed = True
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=f"Invalid upload: {str(e)}")
+    finally:
+        # An aborted or cancelled request can stop mid-file: close its handle and drop the staged files
+        await files_target.aclose()
+        if not parsed:
+            shutil.rmtree(session_dir, ignore_errors=True)
+    
+    property_name = property_name_target.value.decode("utf-8")
+    property_address = property_address_target.value.decode("utf-8")
+    transaction_type = transaction_type_target.value.decode("utf-8") or "refinance"
+    is_bridge_loan = bridge_loan_target.value.decode("utf-8").lower() in ("true", "1", "on", "yes")
+    file_types = file_types_target.value
+    
+    if not property_name or not property_address:
+        shutil.rmtree(session_dir, ignore_errors=True)
+        raise HTTPException(status_code=422, detail="property_name and property_address are required")
+    
+    if not files_target.saved_files:
+        shutil.rmtree(session_dir, ignore_errors=True)
+        raise HTTPException(status_code=400, detail="No files uploaded")
+    
+    # Move staged files into their type-specific directories (rename, no copy)
+    uploaded_files = []
+    file_type_mapping = {}
+    
+    # Get file type for each file (rent_roll, t12, or additional)
+    saved_file_types = [
+        file_types[part_index] if part_index < len(file_types) else 'additional'
+        for part_index, _, _ in files_target.saved_files
+    ]
+    
+    # File types become directory names, so only the known ones are accepted
+    unknown_types = invalid_file_types(saved_file_types)
+    if unknown_types:
+        shutil.rmtree(session_dir, ignore_errors=True)
+        raise HTTPException(status_code=400, detail=f"Unknown file types: {', '.join(unknown_types)}")
+    
+    # Create each type-specific directory once, not once per file
+    for file_type in set(saved_file_types):
+        os.makedirs(os.path.join(session_dir, file_type), exist_ok=True)
+    
+    for (_, staged_path, filename), file_type in zip(files_target.saved_files, saved_file_types):
+        file_path = os.path.join(session_dir, file_type, filename)
+        os.replace(staged_path, file_path)
+        
+        uploaded_files.append(file_path)
+        file_type_mapping[file_path] = file_type
+    
+    return await start_processing(
+        background_tasks, session_id, uploaded_files, file_type_mapping, file_types,
+        property_name, property_address, transaction_type, is_bridge_loan
+    )
+
+@app.post("/api/upload-form")
+async def upload_documents_form(
     background_tasks: BackgroundTasks,
     property_name: str = Form(...),
     property_address: str = Form(...),
@@ -91,12 +420,23 @@ async def upload_documents(
     file_types: List[str] = Form([])
 ):
     """
-    Upload documents and start processing in background.
-    Returns session ID for tracking progress.
+    Upload documents as regular form files and start processing in background.
+    Fallback for clients that can't use the streaming /api/upload endpoint.
     """
     if not files:
         raise HTTPException(status_code=400, detail="No files uploaded")
     
+    # Get file type for each file (rent_roll, t12, or additional)
+    upload_file_types = [
+        file_types[i] if i < len(file_types) else 'additional'
+        for i in range(len(files))
+    ]
+    
+    # File types become directory names, so only the known ones are accepted
+    unknown_types = invalid_file_types(upload_file_types)
+    if unknown_types:
+        raise HTTPException(status_code=400, detail=f"Unknown file types: {', '.join(unknown_types)}")
+    
     # Generate unique session ID
     session_id = str(uuid.uuid4())
     
@@ -104,33 +444,56 @@ async def upload_documents(
     session_dir = f"uploads/{session_id}"
     os.makedirs(session_dir, exist_ok=True)
     
-    # Save uploaded files with type information
-    uploaded_files = []
-    file_type_mapping = {}
+    # Create each type-specific directory once, not once per file
+    for file_type in {upload_file_types[i] for i, file in enumerate(files) if file.filename}:
+        os.makedirs(os.path.join(session_dir, file_type), exist_ok=True)
     
-    for i, file in enumerate(files):
-        if file.filename:
-            # Get file type (rent_roll, t12, or additional)
-            file_type = file_types[i] if i < len(file_types) else 'additional'
-            
-            # Create type-specific directory
-            type_dir = os.path.join(session_dir, file_type)
-            os.makedirs(type_dir, exist_ok=True)
-            
-            file_path = os.path.join(type_dir, file.filename)
-            with open(file_path, "wb") as buffer:
-                shutil.copyfileobj(file.file, buffer)
-            
-            uploaded_files.append(file_path)
-            file_type_mapping[file_path] = file_type
+    # Save uploaded files with type information, several at a time
+    save_sem = asyncio.Semaphore(UPLOAD_SAVE_CONCURRENCY)
+    
+    async def save_one(i: int, file: UploadFile):
+        file_type = upload_file_types[i]
+        
+        # Stream the upload to disk without blocking the event loop
+        file_path = os.path.join(session_dir, file_type, safe_filename(file.filename, f"file_{i}"))
+        async with save_sem:
+            async with aiofiles.open(file_path, "wb") as buffer:
+                while chunk := await file.read(UPLOAD_CHUNK_SIZE):
+                    await buffer.write(chunk)
+        
+        return file_path, file_type
     
+    saved = await asyncio.gather(*(save_one(i, file) for i, file in enumerate(files) if file.filename))
+    
+    # Results come back in upload order
+    uploaded_files = [file_path for file_path, _ in saved]
+    file_type_mapping = dict(saved)
+    
+    return await start_processing(
+        background_tasks, session_id, uploaded_files, file_type_mapping, file_types,
+        property_name, property_address, transaction_type, is_bridge_loan
+    )
+
+async def start_processing(
+    background_tasks: BackgroundTasks,
+    session_id: str,
+    uploaded_files: List[str],
+    file_type_mapping: Dict[str, str],
+    file_types: List[str],
+    property_name: str,
+    property_address: str,
+    transaction_type: str,
+    is_bridge_loan: bool
+) -> Dict[str, Any]:
+    """Register a new session for the saved uploads and queue its background processing."""
     # Count files by type
-    rent_roll_count = sum(1 for ft in file_types if ft == 'rent_roll')
-    t12_count = sum(1 for ft in file_types if ft == 't12')
-    additional_count = sum(1 for ft in file_types if ft == 'additional')
+    type_counts = Counter(file_types)
+    rent_roll_count = type_counts['rent_roll']
+    t12_count = type_counts['t12']
+    additional_count = type_counts['additional']
     
     # Initialize processing status
-    processing_sessions[session_id] = ProcessingStatus(
+    await processing_sessions.save(ProcessingStatusRecord(
         session_id=session_id,
         status="waiting",
         current_step=0,
@@ -138,7 +501,7 @@ async def upload_documents(
         step_name="Initializing...",
         progress_percentage=0.0,
         message=f"Preparing to process {len(uploaded_files)} documents"
-    )
+    ))
     
     # Property information
     property_info = PropertyInfo(
@@ -165,36 +528,90 @@ async def upload_documents(
             "rent_roll": rent_roll_count,
             "t12": t12_count,
             "additional": additional_count
-        }
+        },
+        # Tells the page how to follow progress: the /ws/status WebSocket
+        "progress_transport": "websocket"
     }
 
-@app.get("/api/status/{session_id}")
+@app.get("/api/status/{session_id}", response_model=ProcessingStatus)
 async def get_processing_status(session_id: str):
     """Get current processing status for a session."""
-    if session_id not in processing_sessions:
+    session = await processing_sessions.get(session_id)
+    if session is None:
         raise HTTPException(status_code=404, detail="Session not found")
     
-    return processing_sessions[session_id]
+    # Encode the record directly; ProcessingStatus only documents the schema
+    return Response(status_encoder.encode(session), media_type="application/json")
+
+async def relay_change_notifications(pubsub, queue: asyncio.Queue):
+    """Forward Redis change notifications for a session into a socket's wake-up queue."""
+    async for message in pubsub.listen():
+        if message["type"] == "message":
+            queue.put_nowait(True)
+
+@app.websocket("/ws/status/{session_id}")
+async def status_websocket(websocket: WebSocket, session_id: str):
+    """Push each status change over a WebSocket until processing finishes."""
+    if not await processing_sessions.exists(session_id):
+        await websocket.close(code=4404)
+        return
+    await websocket.accept()
+    
+    queue = asyncio.Queue()
+    progress_subscribers.setdefault(session_id, []).append(queue)
+    
+    # With Redis, also wake up on updates written by other workers
+    pubsub = await processing_sessions.subscribe(session_id)
+    relay = asyncio.create_task(relay_change_notifications(pubsub, queue)) if pubsub else None
+    try:
+        while True:
+            session = await processing_sessions.get(session_id)
+            if session is None:
+                break
+            await websocket.send_text(status_encoder.encode(session).decode("utf-8"))
+            if session.status in ("completed", "error"):
+                break
+            
+            try:
+                await asyncio.wait_for(queue.get(), timeout=PROGRESS_STREAM_KEEPALIVE)
+            except asyncio.TimeoutError:
+                # Re-read the store anyway as a keep-alive
+                pass
+            # Collapse bursts of updates into a single message
+            while not queue.empty():
+                queue.get_nowait()
+        await websocket.close()
+    except WebSocketDisconnect:
+        pass
+    finally:
+        if relay is not None:
+            relay.cancel()
+            await pubsub.reset()
+        subscribers = progress_subscribers.get(session_id, [])
+        if queue in subscribers:
+            subscribers.remove(queue)
+        if not subscribers:
+            progress_subscribers.pop(session_id, None)
 
 @app.get("/api/results/{session_id}")
 async def get_results(session_id: str):
     """Get final results for completed session."""
-    if session_id not in processing_sessions:
+    session = await processing_sessions.get(session_id)
+    if session is None:
         raise HTTPException(status_code=404, detail="Session not found")
     
-    session = processing_sessions[session_id]
     if session.status != "completed":
         raise HTTPException(status_code=400, detail="Processing not completed")
     
-    return session.results
+    return Response(status_encoder.encode(session.results), media_type="application/json")
 
 @app.get("/api/download/{session_id}/{file_type}")
 async def download_file(session_id: str, file_type: str):
     """Download generated files (excel, pdf, html, or csv)."""
-    if session_id not in processing_sessions:
+    session = await processing_sessions.get(session_id)
+    if session is None:
         raise HTTPException(status_code=404, detail="Session not found")
     
-    session = processing_sessions[session_id]
     if session.status != "completed" or not session.results:
         raise HTTPException(status_code=400, detail="No files available")
     
@@ -216,20 +633,80 @@ async def download_file(session_id: str, file_type: str):
     else:
         raise HTTPException(status_code=400, detail="Invalid file type")
     
-    if not file_path or not os.path.exists(file_path):
+    if not file_path:
+        raise HTTPException(status_code=404, detail="File not found")
+    
+    # Stat off the event loop once; FileResponse reuses the result for its headers
+    try:
+        stat_result = await aiofiles.os.stat(file_path)
+    except FileNotFoundError:
         raise HTTPException(status_code=404, detail="File not found")
     
     return FileResponse(
         file_path,
         media_type="application/octet-stream",
-        filename=os.path.basename(file_path)
+        filename=os.path.basename(file_path),
+        stat_result=stat_result
+    )
+
+def extract_document(file_path: str) -> Dict[str, Any]:
+    """Run DocumentProcessor on one file; executed in a process pool worker."""
+    global document_processor
+    if document_processor is None:
+        document_processor = DocumentProcessor(debug=True)
+    return document_processor.process_document(file_path)
+
+def iter_csv(df):
+    """Yield a DataFrame as CSV text: the header first, then CSV_STREAM_ROWS rows at a time."""
+    yield df.iloc[:0].to_csv(index=False)
+    for start in range(0, len(df), CSV_STREAM_ROWS):
+        yield df.iloc[start:start + CSV_STREAM_ROWS].to_csv(header=False, index=False)
+
+def attachment_disposition(filename: str) -> str:
+    """Content-Disposition for a download: a plain ASCII name plus the exact UTF-8 name (RFC 5987)."""
+    ascii_name = re.sub(r'[^A-Za-z0-9._-]', '_', filename)
+    return f"attachment; filename=\"{ascii_name}\"; filename*=UTF-8''{quote(filename, safe='')}"
+
+@app.get("/api/stream/{session_id}/{file_type}")
+async def stream_csv(session_id: str, file_type: str):
+    """Stream an extracted table (rent_roll_csv or t12_csv) as CSV while it is encoded."""
+    if file_type not in ("rent_roll_csv", "t12_csv"):
+        raise HTTPException(status_code=400, detail="Invalid file type")
+    table_name = file_type[:-len("_csv")]
+    
+    session = await processing_sessions.get(session_id)
+    if session is None:
+        # Session deleted or expired - its tables are no longer downloadable
+        extracted_tables.pop(session_id, None)
+        raise HTTPException(status_code=404, detail="Session not found")
+    
+    df = extracted_tables.get(session_id, {}).get(table_name)
+    if df is None:
+        # Table not held by this worker (or evicted) - stream the CSV written to disk
+        return await download_file(session_id, file_type)
+    extracted_tables.move_to_end(session_id)
+    
+    property_name = session.results["property_info"]["property_name"] if session.results else session_id
+    filename = f"{property_name.replace(' ', '_').strip()}_{'RentRoll' if table_name == 'rent_roll' else 'T12'}.csv"
+    return StreamingResponse(
+        iter_csv(df),
+        media_type="text/csv",
+        headers={"Content-Disposition": attachment_disposition(filename)}
     )
 
-async def generate_csv_files(processed_data: Dict, property_info) -> Dict[str, str]:
+def write_text_file(path: str, text: str):
+    """Write fully built file content with a single write call."""
+    with open(path, 'w', newline='', encoding='utf-8') as f:
+        f.write(text)
+
+async def write_text_parts_async(path: str, parts: List[str]):
+    """Write file content given as a list of chunks without blocking the event loop."""
+    async with aiofiles.open(path, 'w', encoding='utf-8') as f:
+        await f.writelines(parts)
+
+async def generate_csv_files(processed_data: Dict, timestamp: str, clean_name: str) -> Dict[str, str]:
     """Generate CSV files for extracted rent roll and T12 data."""
     csv_files = {}
-    timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-    clean_name = property_info.property_name.replace(' ', '_').strip()
     
     try:
         # Generate CSV for rent roll data
@@ -239,9 +716,9 @@ async def generate_csv_files(processed_data: Dict, property_info) -> Dict[str, s
                 # Use the best table (first one as they're sorted by quality)
                 rent_roll_df = tables[0]
                 csv_path = f"outputs/{clean_name}_RentRoll_{timestamp}.csv"
-                rent_roll_df.to_csv(csv_path, index=False)
+                write_text_file(csv_path, rent_roll_df.to_csv(index=False))
                 csv_files['rent_roll'] = csv_path
-                logger.info(f"✅ Rent roll CSV saved: {csv_path}")
+                logger.info("✅ Rent roll CSV saved: %s", csv_path)
         
         # Generate CSV for T12 data
         if 't12' in processed_data and 'tables' in processed_data['t12']:
@@ -250,9 +727,9 @@ async def generate_csv_files(processed_data: Dict, property_info) -> Dict[str, s
                 # Use the best table for T12
                 t12_df = tables[0]
                 csv_path = f"outputs/{clean_name}_T12_{timestamp}.csv"
-                t12_df.to_csv(csv_path, index=False)
+                write_text_file(csv_path, t12_df.to_csv(index=False))
                 csv_files['t12'] = csv_path
-                logger.info(f"✅ T12 CSV saved: {csv_path}")
+                logger.info("✅ T12 CSV saved: %s", csv_path)
         
         # If we have processed data but no tables, create summary CSV
         if processed_data and not csv_files:
@@ -267,13 +744,13 @@ async def generate_csv_files(processed_data: Dict, property_info) -> Dict[str, s
             
             if summary_data:
                 summary_csv = f"outputs/{clean_name}_ExtractionSummary_{timestamp}.csv"
-                with open(summary_csv, 'w', newline='', encoding='utf-8') as f:
-                    if summary_data:
-                        writer = csv.DictWriter(f, fieldnames=summary_data[0].keys())
-                        writer.writeheader()
-                        writer.writerows(summary_data)
+                buffer = io.StringIO()
+                writer = csv.DictWriter(buffer, fieldnames=summary_data[0].keys())
+                writer.writeheader()
+                writer.writerows(summary_data)
+                write_text_file(summary_csv, buffer.getvalue())
                 csv_files['summary'] = summary_csv
-                logger.info(f"✅ Extraction summary CSV saved: {summary_csv}")
+                logger.info("✅ Extraction summary CSV saved: %s", summary_csv)
         
     except Exception as e:
         logger.error(f"❌ Error generating CSV files: {str(e)}")
@@ -291,8 +768,12 @@ async def process_documents_background(
     Uses real processing if available, otherwise falls back to simulation.
     """
     try:
-        session = processing_sessions[session_id]
-        session.status = "processing"
+        await processing_sessions.update(session_id, status="processing")
+        
+        # One timestamp and file-name stem shared by every output of this session
+        timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+        clean_name = property_info.property_name.replace(' ', '_').strip()
+        property_info_dict = property_info.model_dump()
         
         # Categorize files by type
         rent_roll_files = [f for f, t in file_type_mapping.items() if t == 'rent_roll']
@@ -300,57 +781,63 @@ async def process_documents_background(
         additional_files = [f for f, t in file_type_mapping.items() if t == 'additional']
         
         if REAL_PROCESSING_AVAILABLE:
-            logger.info(f"🔬 Using REAL PDF processing for session {session_id}")
+            logger.info("🔬 Using REAL PDF processing for session %s", session_id)
             processing_mode = "real"
         else:
-            logger.info(f"🎭 Using FALLBACK processing for session {session_id}")
+            logger.info("🎭 Using FALLBACK processing for session %s", session_id)
             processing_mode = "fallback"
         
         processed_data = {}
         
         # Step 1: Process documents
-        update_progress(session_id, 1, f"Document Processing ({processing_mode})", 
+        await update_progress(session_id, 1, f"Document Processing ({processing_mode})", 
                        f"Processing {len(uploaded_files)} documents...")
         
         if REAL_PROCESSING_AVAILABLE:
             # Real processing
             try:
-                processor = DocumentProcessor(debug=True)
-                for file_path in rent_roll_files + t12_files + additional_files:
-                    try:
-                        results = processor.process_document(file_path)
-                        file_type = file_type_mapping.get(file_path, 'unknown')
-                        processed_data[file_type] = results
-                        logger.info(f"✅ Processed {file_path}: {len(results['tables'])} tables")
-                    except Exception as e:
-                        logger.error(f"❌ Error processing {file_path}: {str(e)}")
+                document_paths = rent_roll_files + t12_files + additional_files
+                loop = asyncio.get_running_loop()
+                
+                # Extraction is CPU-bound Python, so documents are parsed in worker
+                # processes (outside the GIL), as many at once as the pool has workers
+                all_results = await asyncio.gather(
+                    *(loop.run_in_executor(get_process_pool(), extract_document, file_path) for file_path in document_paths),
+                    return_exceptions=True
+                )
+                
+                for file_path, results in zip(document_paths, all_results):
+                    if isinstance(results, Exception):
+                        logger.error(f"❌ Error processing {file_path}: {str(results)}")
+                        continue
+                    file_type = file_type_mapping.get(file_path, 'unknown')
+                    processed_data[file_type] = results
+                    logger.info("✅ Processed %s: %d tables", file_path, len(results['tables']))
             except Exception as e:
                 logger.error(f"❌ Real processing failed: {e}")
                 processing_mode = "fallback"
         else:
-            # Fallback processing - just simulate
-            await asyncio.sleep(2)
+            logger.warning("⚠️ Fallback mode: no real document processing performed")
         
         # Step 2: Generate CSV files for extracted data
-        update_progress(session_id, 2, f"CSV Generation ({processing_mode})", 
+        await update_progress(session_id, 2, f"CSV Generation ({processing_mode})", 
                        "Generating CSV files for rent roll and T12 data...")
         
         csv_files = {}
         if processed_data and REAL_PROCESSING_AVAILABLE:
-            csv_files = await generate_csv_files(processed_data, property_info)
-        
-        # Step 3-7: Continue with analysis
-        for step in range(3, 8):
-            step_names = {
-                3: "Rent Roll Analysis",
-                4: "T12 Analysis", 
-                5: "Underwriting Summary",
-                6: "Excel Generation",
-                7: "PDF Generation"
-            }
-            update_progress(session_id, step, f"{step_names[step]} ({processing_mode})", 
-                           f"Processing {step_names[step].lower()}...")
-            await asyncio.sleep(1)
+            csv_files = await generate_csv_files(processed_data, timestamp, clean_name)
+            
+            # Keep the best tables around for /api/stream CSV downloads
+            remember_tables(session_id, {
+                doc_type: processed_data[doc_type]['tables'][0]
+                for doc_type in ('rent_roll', 't12')
+                if processed_data.get(doc_type, {}).get('tables')
+            })
+        
+        # Steps 3-5: Analysis and underwriting summary (reported as each stage starts)
+        for step in (3, 4, 5):
+            await update_progress(session_id, step, f"{STEP_NAMES[step]} ({processing_mode})", 
+                           f"Processing {STEP_NAMES[step].lower()}...")
         
         # Create outputs
         base_rent = 1200 if "apartment" in property_info.property_name.lower() else 1500
@@ -387,7 +874,7 @@ async def process_documents_background(
                 output_generator.load_analysis_data(
                     rent_roll_analysis=processed_data.get('rent_roll', {}),
                     t12_analysis=processed_data.get('t12', {}),
-                    property_info=property_info.dict(),
+                    property_info=property_info_dict,
                     underwriting_summary={
                         'income_summary': {'gross_potential_income': gross_potential_income},
                         'noi_analysis': {
@@ -402,22 +889,29 @@ async def process_documents_background(
                 if property_info.is_bridge_loan:
                     output_generator.set_bridge_loan_mode(True)
                 
-                # Generate professional outputs using your existing system
-                excel_path = output_generator.export_to_excel()
-                
-                # Generate HTML-based PDF using the professional template
-                html_path, pdf_path = await create_professional_html_pdf(property_info, financial_data, processed_data)
+                # Steps 6-7: Generate professional outputs using your existing system, and the
+                # HTML-based PDF from the professional template; neither depends on the other
+                await update_progress(session_id, 6, f"{STEP_NAMES[6]} ({processing_mode})", "Processing excel and pdf generation...")
+                loop = asyncio.get_running_loop()
+                excel_path, (html_path, pdf_path) = await asyncio.gather(
+                    loop.run_in_executor(None, output_generator.export_to_excel),
+                    create_professional_html_pdf(property_info, financial_data, timestamp, clean_name, processed_data)
+                )
                 
-                logger.info(f"✅ Professional outputs generated using UnderwritingOutputGenerator + HTML template")
+                logger.info("✅ Professional outputs generated using UnderwritingOutputGenerator + HTML template")
                 
             except Exception as e:
                 logger.error(f"⚠️ UnderwritingOutputGenerator failed: {e}, falling back to simple outputs")
-                excel_path, pdf_path = await create_simple_fallback_outputs(property_info, financial_data)
+                html_path = None
+                excel_path, pdf_path = await create_simple_fallback_outputs(property_info, financial_data, timestamp)
         else:
-            # Fallback to simple outputs
-            excel_path, pdf_path = await create_simple_fallback_outputs(property_info, financial_data)
+            # Steps 6-7: Fallback to simple outputs
+            await update_progress(session_id, 6, f"{STEP_NAMES[6]} ({processing_mode})", "Processing excel and pdf generation...")
+            html_path = None
+            excel_path, pdf_path = await create_simple_fallback_outputs(property_info, financial_data, timestamp)
         
-        # Complete processing
+        # Complete processing (re-read the stored record, it may live in Redis)
+        session = await processing_sessions.get(session_id)
         session.status = "completed"
         session.current_step = 7
         session.progress_percentage = 100.0
@@ -427,7 +921,7 @@ async def process_documents_background(
         # Store results
         session.results = {
             "session_id": session_id,
-            "property_info": property_info.dict(),
+            "property_info": property_info_dict,
             "processing_mode": processing_mode,
             "file_analysis": {
                 "total_files": len(uploaded_files),
@@ -449,24 +943,25 @@ async def process_documents_background(
             "csv_files": csv_files,
             "analysis_success": True
         }
+        await processing_sessions.save(session)
         
-        logger.info(f"✅ Processing completed for session {session_id} using {processing_mode} mode")
+        logger.info("✅ Processing completed for session %s using %s mode", session_id, processing_mode)
         
     except Exception as e:
         logger.error(f"❌ Critical error in processing session {session_id}: {str(e)}")
         import traceback
         traceback.print_exc()
         
-        session = processing_sessions[session_id]
+        session = await processing_sessions.get(session_id)
         session.status = "error"
         session.error_message = str(e)
         session.message = f"Processing failed: {str(e)}"
         session.current_step = 0
         session.progress_percentage = 0.0
+        await processing_sessions.save(session)
 
-async def create_simple_fallback_outputs(property_info, financial_data):
+async def create_simple_fallback_outputs(property_info, financial_data, timestamp):
     """Create simple Excel and PDF outputs as fallback."""
-    timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
     clean_name = property_info.property_name.replace(' ', ' ').strip()
     
     excel_path = f"outputs/{clean_name} Analysis {timestamp}.xlsx"
@@ -526,10 +1021,8 @@ async def create_simple_fallback_outputs(property_info, financial_data):
     
     return excel_path, pdf_path
 
-async def create_professional_html_pdf(property_info, financial_data, processed_data=None):
+async def create_professional_html_pdf(property_info, financial_data, timestamp, clean_name, processed_data=None):
     """Create professional PDF using the HTML template that matches industry standards."""
-    timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-    clean_name = property_info.property_name.replace(' ', '_').strip()
     
     html_path = f"outputs/{clean_name}_Underwriting_{timestamp}.html"
     pdf_path = f"outputs/{clean_name}_Package_{timestamp}.pdf"
@@ -537,13 +1030,9 @@ async def create_professional_html_pdf(property_info, financial_data, processed_
     os.makedirs("outputs", exist_ok=True)
     
     # Read the HTML template
-    template_path = "templates/underwriting_template.html"
-    if not os.path.exists(template_path):
-        logger.error(f"❌ Template not found: {template_path}")
-        return await create_simple_fallback_outputs(property_info, financial_data)
-    
-    with open(template_path, 'r', encoding='utf-8') as f:
-        html_template = f.read()
+    if UNDERWRITING_TEMPLATE is None:
+        logger.error(f"❌ Template not found: {UNDERWRITING_TEMPLATE_PATH}")
+        return await create_simple_fallback_outputs(property_info, financial_data, timestamp)
     
     # Calculate values with real data if available
     unit_count = financial_data.get('estimated_units', 86)
@@ -558,6 +1047,11 @@ async def create_professional_html_pdf(property_info, financial_data, processed_
     noi = financial_data['net_operating_income']
     operating_expenses = financial_data['operating_expenses']
     
+    # Amounts and per-unit amounts: every base figure times its ratio in one vectorized pass
+    bases = np.array([gpi, egi, operating_expenses, noi], dtype=float)
+    amounts = bases[AMOUNT_BASES] * AMOUNT_RATIOS
+    per_unit_amounts = bases[PER_UNIT_BASES] * PER_UNIT_RATIOS / unit_count
+    
     # Template variables with realistic data
     template_vars = {
         # Property Information
@@ -568,16 +1062,13 @@ async def create_professional_html_pdf(property_info, financial_data, processed_
         'property_type': 'Multi-Family',
         'unit_count': unit_count,
         'transaction_type': property_info.transaction_type.title(),
-        'cost_basis': f"{gpi * 8:,.0f}",  # Estimated cost basis
         
         # Loan Terms
-        'loan_amount': f"{noi * 12.5:,.0f}",  # Estimated loan amount
         'interest_rate': '7.75',
         'loan_program': 'DSCR Bridge',
         'ltv': '80',
         'interest_only': 'Yes',
         'io_term': '24',
-        'property_value': f"{gpi * 10:,.0f}",  # Estimated property value
         
         # Underwriting Assumptions
         'vacancy_rate': f"{financial_data['vacancy_factor'] * 100:.1f}",
@@ -587,102 +1078,23 @@ async def create_professional_html_pdf(property_info, financial_data, processed_
         'key_reserve': '14.05',
         'cap_rate': f"{(noi / (gpi * 10)) * 100:.1f}",
         
-        # Revenue - T-12 (from processed data or estimates)
-        't12_rental_income': f"{gpi * 0.92:,.0f}",
-        't12_rental_per_unit': f"{(gpi * 0.92) / unit_count:,.0f}",
-        't12_admin_income': f"{gpi * 0.01:,.0f}",
-        't12_admin_per_unit': f"{(gpi * 0.01) / unit_count:,.0f}",
-        't12_laundry': f"{gpi * 0.009:,.0f}",
-        't12_laundry_per_unit': f"{(gpi * 0.009) / unit_count:,.0f}",
-        't12_rubs': f"{gpi * 0.054:,.0f}",
-        't12_rubs_per_unit': f"{(gpi * 0.054) / unit_count:,.0f}",
-        't12_gpi': f"{gpi:,.0f}",
-        't12_gpi_per_unit': f"{gpi / unit_count:,.0f}",
+        # Revenue and expenses without source data
         't12_vacancy': '0',
         't12_vacancy_per_unit': '0',
         't12_adjustments': '0',
         't12_adjustments_per_unit': '0',
-        't12_egi': f"{egi * 0.99:,.0f}",
-        't12_egi_per_unit': f"{(egi * 0.99) / unit_count:,.0f}",
-        
-        # Revenue - T-5 (recent trending)
-        't5_rental_income': f"{gpi * 0.38:,.0f}",  # 5 months
-        't5_annualized_rental': f"{gpi * 0.96:,.0f}",
-        't5_rental_per_unit': f"{(gpi * 0.96) / unit_count:,.0f}",
-        't5_admin_income': f"{gpi * 0.004:,.0f}",
-        't5_annualized_admin': f"{gpi * 0.0095:,.0f}",
-        't5_admin_per_unit': f"{(gpi * 0.0095) / unit_count:,.0f}",
-        't5_laundry': f"{gpi * 0.0036:,.0f}",
-        't5_annualized_laundry': f"{gpi * 0.0087:,.0f}",
-        't5_laundry_per_unit': f"{(gpi * 0.0087) / unit_count:,.0f}",
-        't5_rubs': f"{gpi * 0.023:,.0f}",
-        't5_annualized_rubs': f"{gpi * 0.055:,.0f}",
-        't5_rubs_per_unit': f"{(gpi * 0.055) / unit_count:,.0f}",
-        't5_gpi': f"{gpi * 0.406:,.0f}",
-        't5_annualized_gpi': f"{gpi * 0.976:,.0f}",
-        't5_gpi_per_unit': f"{(gpi * 0.976) / unit_count:,.0f}",
         't5_vacancy': '0',
         't5_annualized_vacancy': '0',
         't5_vacancy_per_unit': '0',
         't5_adjustments': '0',
         't5_annualized_adjustments': '0',
         't5_adjustments_per_unit': '0',
-        't5_egi': f"{egi * 0.406:,.0f}",
-        't5_annualized_egi': f"{egi * 0.97:,.0f}",
-        't5_egi_per_unit': f"{(egi * 0.97) / unit_count:,.0f}",
-        
-        # Revenue - UW (Underwritten)
-        'uw_rental_income': f"{gpi * 0.928:,.0f}",
-        'uw_rental_per_unit': f"{(gpi * 0.928) / unit_count:,.0f}",
-        'uw_admin_income': f"{gpi * 0.0078:,.0f}",
-        'uw_admin_per_unit': f"{(gpi * 0.0078) / unit_count:,.0f}",
-        'uw_laundry': f"{gpi * 0.0087:,.0f}",
-        'uw_laundry_per_unit': f"{(gpi * 0.0087) / unit_count:,.0f}",
-        'uw_rubs': f"{gpi * 0.0553:,.0f}",
-        'uw_rubs_per_unit': f"{(gpi * 0.0553) / unit_count:,.0f}",
-        'uw_gpi': f"{gpi:,.0f}",
-        'uw_gpi_per_unit': f"{gpi / unit_count:,.0f}",
         'uw_vacancy': f"{egi - gpi:,.0f}",
         'uw_vacancy_per_unit': f"{(egi - gpi) / unit_count:,.0f}",
         'uw_adjustments': '0',
         'uw_adjustments_per_unit': '0',
-        'uw_egi': f"{egi:,.0f}",
-        'uw_egi_per_unit': f"{egi / unit_count:,.0f}",
-        
-        # Expenses - Fixed
-        't12_taxes': f"{operating_expenses * 0.17:,.0f}",
-        't12_taxes_per_unit': f"{(operating_expenses * 0.17) / unit_count:,.0f}",
-        't12_insurance': f"{operating_expenses * 0.052:,.0f}",
-        't12_insurance_per_unit': f"{(operating_expenses * 0.052) / unit_count:,.0f}",
-        't12_fixed_total': f"{operating_expenses * 0.22:,.0f}",
-        't12_fixed_per_unit': f"{(operating_expenses * 0.22) / unit_count:,.0f}",
-        
-        't5_taxes': f"{operating_expenses * 0.07:,.0f}",
-        't5_annualized_taxes': f"{operating_expenses * 0.168:,.0f}",
-        't5_taxes_per_unit': f"{(operating_expenses * 0.168) / unit_count:,.0f}",
-        't5_insurance': f"{operating_expenses * 0.022:,.0f}",
-        't5_annualized_insurance': f"{operating_expenses * 0.052:,.0f}",
-        't5_insurance_per_unit': f"{(operating_expenses * 0.052) / unit_count:,.0f}",
-        't5_fixed_total': f"{operating_expenses * 0.092:,.0f}",
-        't5_annualized_fixed': f"{operating_expenses * 0.22:,.0f}",
-        't5_fixed_per_unit': f"{(operating_expenses * 0.22) / unit_count:,.0f}",
-        
-        'uw_taxes': f"{operating_expenses * 0.48:,.0f}",
-        'uw_taxes_per_unit': f"{(operating_expenses * 0.48) / unit_count:,.0f}",
-        'uw_insurance': f"{operating_expenses * 0.053:,.0f}",
-        'uw_insurance_per_unit': f"{(operating_expenses * 0.053) / unit_count:,.0f}",
-        'uw_fixed_total': f"{operating_expenses * 0.533:,.0f}",
-        'uw_fixed_per_unit': f"{(operating_expenses * 0.533) / unit_count:,.0f}",
-        
-        # NOI and Cash Flow
-        't12_noi': f"{noi * 1.097:,.0f}",
-        't12_noi_per_unit': f"{(noi * 1.097) / unit_count:,.0f}",
-        't5_noi': f"{noi * 0.481:,.0f}",
-        't5_annualized_noi': f"{noi * 1.154:,.0f}",
-        't5_noi_per_unit': f"{(noi * 1.154) / unit_count:,.0f}",
-        'uw_noi': f"{noi:,.0f}",
-        'uw_noi_per_unit': f"{noi / unit_count:,.0f}",
         
+        # Capital expenditures and cash flow after reserves
         't12_capex': '0',
         't12_capex_per_unit': '0',
         't5_capex': '0',
@@ -690,104 +1102,229 @@ async def create_professional_html_pdf(property_info, financial_data, processed_
         't5_capex_per_unit': '0',
         'uw_capex': f"{unit_count * 250:,.0f}",
         'uw_capex_per_unit': '250',
-        
-        't12_cash_flow': f"{noi * 1.097:,.0f}",
-        't12_cash_flow_per_unit': f"{(noi * 1.097) / unit_count:,.0f}",
-        't5_cash_flow': f"{noi * 0.481:,.0f}",
-        't5_annualized_cash_flow': f"{noi * 1.154:,.0f}",
-        't5_cash_flow_per_unit': f"{(noi * 1.154) / unit_count:,.0f}",
         'uw_cash_flow': f"{noi - (unit_count * 250):,.0f}",
         'uw_cash_flow_per_unit': f"{(noi - (unit_count * 250)) / unit_count:,.0f}",
         
         # Debt Service and Ratios
-        'debt_service': f"{noi * 0.978:,.0f}",
         't12_dscr': f"{(noi * 1.097) / (noi * 0.978):.2f}",
         't5_dscr': f"{(noi * 1.154) / (noi * 0.978):.2f}",
         'uw_dscr': f"{noi / (noi * 0.978):.2f}",
         'debt_yield': f"{(noi / (noi * 12.5)) * 100:.2f}",
     }
+    template_vars.update(zip(AMOUNT_KEYS, [f"{value:,.0f}" for value in amounts.tolist()]))
+    template_vars.update(zip(PER_UNIT_KEYS, [f"{value:,.0f}" for value in per_unit_amounts.tolist()]))
     
-    # Replace template variables
-    html_content = html_template
-    for key, value in template_vars.items():
-        placeholder = f"{{{{{key}}}}}"
-        html_content = html_content.replace(placeholder, str(value))
+    # Fill the {{key}} placeholders as a list of chunks; the literal chunks are the template's
+    # own strings, so the full report is never assembled into one string in this process
+    if underwriting_template is not None:
+        html_parts = list(underwriting_template.generate(**template_vars))
+    else:
+        html_parts = UNDERWRITING_SEGMENTS.copy()
+        for i in range(1, len(html_parts), 2):
+            key = html_parts[i]
+            # Placeholders without a value are left untouched
+            html_parts[i] = str(template_vars[key]) if key in template_vars else f"{{{{{key}}}}}"
     
-    # Save HTML file
-    with open(html_path, 'w', encoding='utf-8') as f:
-        f.write(html_content)
+    # Without any PDF converter the saved HTML file doubles as the package; no second copy
+    if not PDF_BACKENDS:
+        logger.info("⚠️ No PDF libraries available, serving the HTML report as the package")
+        await write_text_parts_async(html_path, html_parts)
+        return html_path, html_path
+    
+    # Write the HTML file asynchronously while a pool worker renders the PDF from the same content
+    loop = asyncio.get_running_loop()
+    _, pdf_path = await asyncio.gather(
+        write_text_parts_async(html_path, html_parts),
+        loop.run_in_executor(get_process_pool(), render_pdf, html_parts, html_path, pdf_path)
+    )
+    return html_path, pdf_path
+
+def render_with_weasyprint(html_content, base_url, pdf_path):
+    """Render with WeasyPrint using the cached fonts and report stylesheet."""
+    stylesheets = None
+    if REPORT_CSS is not None and REPORT_STYLE_BLOCK in html_content:
+        html_content = html_content.replace(REPORT_STYLE_BLOCK, "", 1)
+        stylesheets = [REPORT_CSS]
+    
+    html_doc = weasyprint.HTML(string=html_content, base_url=base_url)
+    html_doc.write_pdf(pdf_path, stylesheets=stylesheets, font_config=FONT_CONFIG)
+
+def render_with_wkhtmltopdf(html_content, base_url, pdf_path):
+    """Render with the wkhtmltopdf binary, piping the HTML on stdin."""
+    command = [WKHTMLTOPDF_PATH]
+    for option, value in WKHTMLTOPDF_OPTIONS.items():
+        command.extend((f"--{option}", value))
+    command.extend(('-', pdf_path))
+    result = subprocess.run(command, input=html_content.encode('utf-8'), capture_output=True)
     
-    # Try to convert HTML to PDF
+    # wkhtmltopdf only exits with 0 once the PDF is written, so no stat is needed
+    if result.returncode != 0:
+        raise RuntimeError(result.stderr.decode('utf-8', errors='replace').strip() or f"exit code {result.returncode}")
+
+def render_with_pdfkit(html_content, base_url, pdf_path):
+    """Render with pdfkit."""
+    pdfkit.from_string(html_content, pdf_path, options=WKHTMLTOPDF_OPTIONS)
+
+# PDF converters available in this process, in order of preference
+PDF_BACKENDS = [
+    (name, render)
+    for name, render, available in (
+        ("WeasyPrint", render_with_weasyprint, weasyprint is not None),
+        ("wkhtmltopdf", render_with_wkhtmltopdf, WKHTMLTOPDF_PATH is not None),
+        ("pdfkit", render_with_pdfkit, pdfkit is not None),
+    )
+    if available
+]
+
+def load_cached_pdf(cache_path, pdf_path):
+    """Place a cached render at pdf_path; returns False on a cache miss."""
     try:
-        # Option 1: Use WeasyPrint (now installed)
-        import weasyprint
-        
-        # Configure WeasyPrint for landscape orientation and better rendering
-        html_doc = weasyprint.HTML(filename=html_path)
-        pdf_doc = html_doc.render()
-        pdf_doc.write_pdf(pdf_path)
-        
-        logger.info(f"✅ Professional PDF generated using WeasyPrint: {pdf_path}")
-        return html_path, pdf_path
-        
+        link_or_copy(cache_path, pdf_path)
+    except FileNotFoundError:
+        return False
+    # Mark the entry as recently used for eviction
+    os.utime(cache_path)
+    return True
+
+def write_compact_pdf(pdf_path, compact_path):
+    """Write a recompressed, linearized copy of pdf_path for serving from the cache.
+    
+    Uses pikepdf (QPDF) when installed; returns False when it isn't available.
+    """
+    try:
+        import pikepdf
+    except ImportError:
+        return False
+    
+    tmp_path = f"{compact_path}.{os.getpid()}.tmp"
+    try:
+        with pikepdf.Pdf.open(pdf_path) as pdf:
+            pdf.save(
+                tmp_path,
+                linearize=True,
+                compress_streams=True,
+                recompress_flate=True,
+                object_stream_mode=pikepdf.ObjectStreamMode.generate
+            )
+        os.replace(tmp_path, compact_path)
     except Exception as e:
-        logger.warning(f"⚠️ WeasyPrint failed: {e}, trying alternative methods")
+        logger.warning(f"⚠️ Could not recompress cached PDF: {e}")
+        if os.path.lexists(tmp_path):
+            os.remove(tmp_path)
+        return False
+    return True
+
+def store_cached_pdf(pdf_path, cache_path):
+    """Add a fresh render to the PDF cache and evict old entries if it is over budget.
     
+    The cached copy is recompressed and linearized once, so every later hit serves a
+    smaller file that browsers can display progressively.
+    """
     try:
-        # Option 2: Try using wkhtmltopdf if available
-        import subprocess
-        result = subprocess.run([
-            'wkhtmltopdf', '--page-size', 'A4', '--orientation', 'Landscape',
-            '--margin-top', '0.5in', '--margin-bottom', '0.5in',
-            '--margin-left', '0.5in', '--margin-right', '0.5in',
-            html_path, pdf_path
-        ], capture_output=True)
-        
-        if result.returncode == 0 and os.path.exists(pdf_path):
-            logger.info(f"✅ Professional PDF generated using wkhtmltopdf: {pdf_path}")
-            return html_path, pdf_path
-            
-    except (FileNotFoundError, subprocess.SubprocessError):
-        logger.info("⚠️ wkhtmltopdf not available, trying pdfkit")
+        os.makedirs(PDF_CACHE_DIR, exist_ok=True)
+        if not write_compact_pdf(pdf_path, cache_path):
+            link_or_copy(pdf_path, cache_path)
+    except OSError as e:
+        logger.warning(f"⚠️ Could not cache PDF: {e}")
+        return
+    prune_pdf_cache()
+
+def prune_pdf_cache():
+    """Delete least recently used cache entries until the cache fits PDF_CACHE_MAX_BYTES.
     
+    Other workers may evict entries concurrently, so files that vanish mid-walk are skipped.
+    """
+    entries = []
     try:
-        # Option 3: Try using pdfkit
-        import pdfkit
-        pdfkit.from_file(html_path, pdf_path, options={
-            'page-size': 'A4',
-            'orientation': 'Landscape',
-            'margin-top': '0.5in',
-            'margin-right': '0.5in',
-            'margin-bottom': '0.5in',
-            'margin-left': '0.5in',
-        })
-        logger.info(f"✅ Professional PDF generated using pdfkit: {pdf_path}")
-        return html_path, pdf_path
-        
-    except ImportError:
-        logger.info("⚠️ No additional PDF libraries available")
-        # Return HTML file as the "PDF" 
-        shutil.copy2(html_path, pdf_path.replace('.pdf', '.html'))
-        return html_path, pdf_path.replace('.pdf', '.html')
+        with os.scandir(PDF_CACHE_DIR) as it:
+            for entry in it:
+                try:
+                    if not entry.is_file():
+                        continue
+                    stat = entry.stat()
+                except OSError:
+                    continue
+                entries.append((stat.st_atime, stat.st_size, entry.path))
+    except OSError as e:
+        logger.warning(f"⚠️ Could not scan PDF cache: {e}")
+        return
+    total_size = sum(size for _, size, _ in entries)
+    if total_size <= PDF_CACHE_MAX_BYTES:
+        return
+    for _, size, path in sorted(entries):
+        try:
+            os.remove(path)
+        except OSError:
+            continue
+        total_size -= size
+        if total_size <= PDF_CACHE_MAX_BYTES:
+            break
+
+def render_pdf(html_parts, html_path, pdf_path):
+    """Convert rendered HTML chunks to a PDF; executed in a process pool worker.
+    
+    Returns the path of the file produced.
+    """
+    # The converters parse a complete document, so the chunks are joined here in the worker
+    html_content = "".join(html_parts)
+    
+    # Relative links in the report resolve against the directory the HTML is saved in
+    base_url = os.path.dirname(os.path.abspath(html_path))
+    
+    # The saved HTML keeps them; the PDF doesn't need scripts or screen-only stylesheets
+    if REPORT_HAS_SCREEN_ASSETS:
+        html_content = PDF_SCREEN_ASSETS_PATTERN.sub("", html_content)
+    
+    # Identical reports render to identical PDFs, so reuse an earlier render when there is one
+    digest = hashlib.blake2b(html_content.encode('utf-8'), digest_size=16).hexdigest()
+    cache_path = os.path.join(PDF_CACHE_DIR, f"{digest}.pdf")
+    if PDF_BACKENDS and load_cached_pdf(cache_path, pdf_path):
+        logger.info("✅ Professional PDF reused from cache: %s", pdf_path)
+        return pdf_path
+    
+    # An existing file at pdf_path may be a link to a cache entry; never render into it
+    try:
+        os.remove(pdf_path)
+    except FileNotFoundError:
+        pass
+    
+    # Try each available converter in turn
+    for name, render in PDF_BACKENDS:
+        try:
+            render(html_content, base_url, pdf_path)
+        except Exception as e:
+            logger.warning(f"⚠️ {name} failed: {e}, trying alternative methods")
+            continue
+        logger.info("✅ Professional PDF generated using %s: %s", name, pdf_path)
+        store_cached_pdf(pdf_path, cache_path)
+        return pdf_path
+    
+    logger.info("⚠️ No PDF libraries available")
+    # Return HTML file as the "PDF" 
+    html_copy_path = pdf_path.replace('.pdf', '.html')
+    with open(html_copy_path, 'w', encoding='utf-8') as f:
+        f.write(html_content)
+    return html_copy_path
 
 def extract_city_state_zip(address):
     """Extract city, state, zip from address string."""
-    # Simple extraction - could be enhanced with regex
-    parts = address.split(',')
+    # Only the last two comma-separated fields are needed
+    parts = address.rsplit(',', 2)
     if len(parts) >= 2:
-        return ', '.join(parts[-2:]).strip()
+        return f"{parts[-2].strip()}, {parts[-1].strip()}"
     return address
 
-def update_progress(session_id: str, step: int, step_name: str, message: str):
-    """Update processing progress for a session."""
-    if session_id in processing_sessions:
-        session = processing_sessions[session_id]
-        session.current_step = step
-        session.total_steps = 7
-        session.step_name = step_name
-        session.progress_percentage = (step / 7) * 100
-        session.message = message
-        logger.info(f"📊 Session {session_id}: Step {step}/7 - {step_name}")
+async def update_progress(session_id: str, step: int, step_name: str, message: str):
+    """Update processing progress for a session (sessions that were removed are skipped)."""
+    await processing_sessions.update(
+        session_id,
+        current_step=step,
+        total_steps=7,
+        step_name=step_name,
+        progress_percentage=(step / 7) * 100,
+        message=message
+    )
+    logger.info("📊 Session %s: Step %d/7 - %s", session_id, step, step_name)
 
 @app.get("/api/health")
 async def health_check():
@@ -798,18 +1335,59 @@ async def health_check():
 @app.delete("/api/cleanup/{session_id}")
 async def cleanup_session(session_id: str):
     """Clean up session data (development only)."""
-    if session_id in processing_sessions:
-        del processing_sessions[session_id]
+    if await processing_sessions.delete(session_id):
+        extracted_tables.pop(session_id, None)
         
         # Clean up files
         session_dir = f"uploads/{session_id}"
-        if os.path.exists(session_dir):
+        try:
             shutil.rmtree(session_dir)
+        except FileNotFoundError:
+            pass
         
         return {"message": f"Session {session_id} cleaned up"}
     
     raise HTTPException(status_code=404, detail="Session not found")
 
+def write_updated_pdf(pdf_path: str, updated_pdf_path: str, notes: str, extra_pdfs: List[bytes]) -> bool:
+    """Write updated_pdf_path as an incremental update of pdf_path.
+    
+    The original bytes are kept as they are and only the notes annotation and any
+    appended pages are written after them, so the document is never re-serialized.
+    The notes go on the last page of the original report, where the sign-off sits.
+    When pypdf isn't installed or the package isn't a PDF, the package is hard-linked
+    (or copied) unchanged instead and False is returned: nothing was embedded.
+    """
+    try:
+        from pypdf import PdfWriter
+        from pypdf.annotations import FreeText
+    except ImportError:
+        PdfWriter = None
+    
+    if PdfWriter is None or not pdf_path.lower().endswith('.pdf'):
+        link_or_copy(pdf_path, updated_pdf_path)
+        return False
+    
+    writer = PdfWriter(pdf_path, incremental=True)
+    if notes:
+        last_page = len(writer.pages) - 1
+        writer.add_annotation(page_number=last_page, annotation=FreeText(text=notes, rect=(36, 36, 336, 136)))
+    for data in extra_pdfs:
+        writer.append(io.BytesIO(data))
+    # Written beside and renamed over, since an existing file there may be a hard link
+    tmp_path = f"{updated_pdf_path}.{os.getpid()}.tmp"
+    try:
+        with open(tmp_path, 'wb') as f:
+            writer.write(f)
+        os.replace(tmp_path, updated_pdf_path)
+    except BaseException:
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+        raise
+    return True
+
 @app.post("/api/update-pdf/{session_id}")
 async def update_pdf_content(
     session_id: str,
@@ -818,41 +1396,68 @@ async def update_pdf_content(
 ):
     """
     Update PDF package with additional notes or pages before download.
+    
+    Notes and PDF pages are embedded when pypdf is installed and the package is a PDF;
+    otherwise the notes are only recorded with the session results, and the response's
+    notes_embedded flag says so.
     """
-    if session_id not in processing_sessions:
+    session_status = await processing_sessions.get(session_id)
+    if session_status is None:
         raise HTTPException(status_code=404, detail="Session not found")
     
-    session_status = processing_sessions[session_id]
-    
     if session_status.status != "completed":
         raise HTTPException(status_code=400, detail="Analysis not completed yet")
     
     try:
+        notes_embedded = False
+        pages_appended = 0
+        
+        # Only PDFs can be appended as pages; anything else is reported back as rejected
+        extra_pdfs = []
+        rejected_pages = []
+        for page in additional_pages:
+            if not page.filename:
+                continue
+            if page.filename.lower().endswith('.pdf'):
+                extra_pdfs.append(await page.read())
+            else:
+                rejected_pages.append(page.filename)
+        
         # Update PDF with additional content
         results = session_status.results
         if results and "pdf_path" in results:
             pdf_path = results["pdf_path"]
             
-            # For demo, create an updated PDF with notes
-            if pdf_notes:
-                # Create updated filename
-                base_name = os.path.splitext(pdf_path)[0]
-                updated_pdf_path = f"{base_name}_Updated.pdf"
+            # Create an updated PDF with the notes and extra pages
+            if pdf_notes or extra_pdfs:
+                # Create updated filename, keeping the package's extension (HTML without a converter)
+                base_name, extension = os.path.splitext(pdf_path)
+                updated_pdf_path = f"{base_name}_Updated{extension}"
                 
-                # In a real implementation, you would modify the PDF content here
-                # For demo, just copy and rename
-                shutil.copy2(pdf_path, updated_pdf_path)
+                loop = asyncio.get_running_loop()
+                notes_embedded = await loop.run_in_executor(None, write_updated_pdf, pdf_path, updated_pdf_path, pdf_notes, extra_pdfs)
+                pages_appended = len(extra_pdfs) if notes_embedded else 0
                 
                 # Update the results with new path
                 session_status.results["pdf_path"] = updated_pdf_path
                 session_status.results["pdf_updated"] = True
                 session_status.results["update_notes"] = pdf_notes
+                session_status.results["notes_embedded"] = notes_embedded
+                await processing_sessions.update(session_id, results=session_status.results)
+        
+        if notes_embedded or not (pdf_notes or extra_pdfs):
+            message = "PDF updated successfully"
+        else:
+            message = "Notes recorded with the session but not embedded in the package (requires pypdf and a PDF package)"
         
         return {
-            "message": "PDF updated successfully",
+            "message": message,
             "session_id": session_id,
             "pdf_path": session_status.results.get("pdf_path", ""),
-            "updated": True
+            "updated": True,
+            "notes_embedded": notes_embedded,
+            "pages_appended": pages_appended,
+            "rejected_pages": rejected_pages
         }
         
     except Exception as e:
@@ -872,4 +1477,11 @@ if __name__ == "__main__":
     print("📊 Access the application at: http://localhost:8007")
     print(f"🎯 Now using: {processing_mode}")
     
-    uvicorn.run(app, host="0.0.0.0", port=8007, reload=False)
+    # Several workers only when sessions are shared through Redis; in-memory
+    # sessions would otherwise be split between the worker processes
+    workers = int(os.getenv("WEB_CONCURRENCY", os.cpu_count() or 1)) if processing_sessions.redis else 1
+    print(f"⚙️ Starting {workers} worker(s)")
+    # Read back by each worker to size its share of the process pool
+    os.environ["WEB_CONCURRENCY"] = str(workers)
+    
+    uvicorn.run("app_demo_fixed:app", host="0.0.0.0", port=8007, reload=False, workers=workers)
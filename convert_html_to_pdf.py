@@ -4,10 +4,138 @@ HTML to PDF Converter
 Converts the existing HTML underwriting report to PDF using available libraries.
 """
 
+import importlib.util
+import mmap
+import multiprocessing
 import os
+import re
+import shutil
+import subprocess
 import sys
+import time
 from pathlib import Path
 
+from file_utils import link_or_copy
+
+# First <h1> of the report, matched on raw bytes
+H1_PATTERN = re.compile(rb'<h1[^>]*>([^<]+)</h1>')
+
+def extract_title(html_file):
+    """Return the text of the report's first <h1>, or None.
+    
+    The file is memory-mapped and searched as bytes, so only the matched title is
+    decoded rather than the whole document.
+    """
+    with open(html_file, 'rb') as f:
+        try:
+            content = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            # Empty files can't be mapped
+            return None
+        with content:
+            match = H1_PATTERN.search(content)
+            return match.group(1).decode('utf-8', errors='replace') if match else None
+
+def remove_quietly(path):
+    """Delete a file if it exists."""
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+def render_with_weasyprint(html_file, pdf_file):
+    """Render the full report with WeasyPrint; runs in a child process during the race."""
+    try:
+        import weasyprint
+        html_doc = weasyprint.HTML(filename=html_file)
+        html_doc.write_pdf(pdf_file)
+    except Exception as e:
+        print(f"⚠️ WeasyPrint failed: {e}")
+        sys.exit(1)
+
+def start_weasyprint(html_file, pdf_file):
+    """Start WeasyPrint in its own process so it can be killed if it loses the race."""
+    if importlib.util.find_spec('weasyprint') is None:
+        raise ImportError("weasyprint not installed")
+    process = multiprocessing.Process(target=render_with_weasyprint, args=(html_file, pdf_file), daemon=True)
+    process.start()
+    return process
+
+def start_wkhtmltopdf(html_file, pdf_file):
+    """Start the wkhtmltopdf binary on the full report."""
+    wkhtmltopdf = shutil.which('wkhtmltopdf')
+    if wkhtmltopdf is None:
+        raise ImportError("wkhtmltopdf not found")
+    return subprocess.Popen([
+        wkhtmltopdf, '--page-size', 'A4', '--orientation', 'Landscape',
+        '--margin-top', '0.5in', '--margin-bottom', '0.5in',
+        '--margin-left', '0.5in', '--margin-right', '0.5in',
+        html_file, pdf_file
+    ], stdin=subprocess.DEVNULL, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+def exit_code(job):
+    """Exit status of a renderer process, or None while it is still running."""
+    if isinstance(job, subprocess.Popen):
+        return job.poll()
+    return job.exitcode
+
+def stop(job):
+    """Kill a renderer process and wait for it to go away."""
+    job.terminate()
+    if isinstance(job, subprocess.Popen):
+        job.wait()
+    else:
+        job.join()
+
+# Converters that render the complete formatted report; they are raced against each other.
+# reportlab is left out: it only writes a one-page summary, which would nearly always win.
+FULL_RENDERERS = (
+    ("WeasyPrint", start_weasyprint),
+    ("wkhtmltopdf", start_wkhtmltopdf),
+)
+
+# How often the race checks whether a renderer has finished
+RACE_POLL_SECONDS = 0.05
+
+def race_full_renderers(html_file, pdf_file):
+    """Run the full renderers concurrently and keep the first PDF produced.
+    
+    Each renderer runs in its own process and writes its own temporary file; the
+    winner's is renamed to pdf_file and the others are killed, so the script exits
+    as soon as one PDF is ready. Returns the winner's name, or None when every
+    renderer failed.
+    """
+    running = {}
+    for name, start in FULL_RENDERERS:
+        tmp_file = f"{pdf_file}.{name}.tmp.pdf"
+        try:
+            running[name] = (start(html_file, tmp_file), tmp_file)
+        except ImportError:
+            print(f"⚠️ {name} not available")
+        except Exception as e:
+            print(f"⚠️ {name} failed: {e}")
+    
+    winner = None
+    try:
+        while running and winner is None:
+            time.sleep(RACE_POLL_SECONDS)
+            for name, (job, tmp_file) in list(running.items()):
+                code = exit_code(job)
+                if code is None:
+                    continue
+                del running[name]
+                if code == 0 and os.path.exists(tmp_file):
+                    os.replace(tmp_file, pdf_file)
+                    winner = name
+                    break
+                print(f"⚠️ {name} failed: exit code {code}")
+                remove_quietly(tmp_file)
+    finally:
+        for job, tmp_file in running.values():
+            stop(job)
+            remove_quietly(tmp_file)
+    return winner
+
 def convert_html_to_pdf(html_file, pdf_file):
     """Convert HTML file to PDF using available libraries."""
     
@@ -17,17 +145,11 @@ def convert_html_to_pdf(html_file, pdf_file):
     
     print(f"🔄 Converting {html_file} to PDF...")
     
-    # Method 1: Try WeasyPrint
-    try:
-        import weasyprint
-        html_doc = weasyprint.HTML(filename=html_file)
-        html_doc.write_pdf(pdf_file)
-        print(f"✅ PDF generated using WeasyPrint: {pdf_file}")
+    # Method 1: Race WeasyPrint and wkhtmltopdf, keeping whichever finishes first
+    winner = race_full_renderers(html_file, pdf_file)
+    if winner:
+        print(f"✅ PDF generated using {winner}: {pdf_file}")
         return True
-    except ImportError:
-        print("⚠️ WeasyPrint not available")
-    except Exception as e:
-        print(f"⚠️ WeasyPrint failed: {e}")
     
     # Method 2: Try reportlab with HTML parsing
     try:
@@ -35,11 +157,6 @@ def convert_html_to_pdf(html_file, pdf_file):
         from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer
         from reportlab.lib.styles import getSampleStyleSheet
         from reportlab.lib.units import inch
-        import re
-        
-        # Read HTML content
-        with open(html_file, 'r', encoding='utf-8') as f:
-            html_content = f.read()
         
         # Extract title and create simple PDF
         doc = SimpleDocTemplate(pdf_file, pagesize=A4)
@@ -47,8 +164,7 @@ def convert_html_to_pdf(html_file, pdf_file):
         story = []
         
         # Extract property name from HTML
-        property_match = re.search(r'<h1[^>]*>([^<]+)</h1>', html_content)
-        title = property_match.group(1) if property_match else "Underwriting Analysis"
+        title = extract_title(html_file) or "Underwriting Analysis"
         
         story.append(Paragraph(f"<b>{title}</b>", styles['Title']))
         story.append(Spacer(1, 12))
@@ -65,11 +181,10 @@ def convert_html_to_pdf(html_file, pdf_file):
     except Exception as e:
         print(f"⚠️ reportlab failed: {e}")
     
-    # Method 3: Copy HTML as PDF (fallback)
+    # Method 3: Link HTML as PDF (fallback)
     try:
-        import shutil
         fallback_pdf = pdf_file.replace('.pdf', '_report.html')
-        shutil.copy2(html_file, fallback_pdf)
+        link_or_copy(html_file, fallback_pdf)
         print(f"✅ HTML report copied as: {fallback_pdf}")
         return fallback_pdf
     except Exception as e:
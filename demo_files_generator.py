@@ -6,16 +6,15 @@ Creates a sample HTML file and converts it to PDF to demonstrate the functionali
 
 import os
 from datetime import datetime
+from html import escape
+from html.parser import HTMLParser
+from pathlib import Path
 
-def create_sample_html():
-    """Create a sample HTML file similar to the underwriting template."""
-    timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-    html_path = f"outputs/Sample_Package_{timestamp}.html"
-    
-    os.makedirs("outputs", exist_ok=True)
-    
-    # Create sample HTML content
-    html_content = """
+# Write buffer for the sample CSVs: rows go out in a few large writes instead of one per row
+CSV_BUFFER_SIZE = 1 << 20
+
+# Sample report markup before and after the analysis date, encoded once at import
+SAMPLE_HTML_PREFIX = """
 <!DOCTYPE html>
 <html lang="en">
 <head>
@@ -88,7 +87,9 @@ def create_sample_html():
             <p><strong>Address:</strong> 123 Main Street, Atlanta, GA 30309</p>
             <p><strong>Units:</strong> 86</p>
             <p><strong>Transaction Type:</strong> Acquisition</p>
-            <p><strong>Analysis Date:</strong> """ + datetime.now().strftime('%B %d, %Y') + """</p>
+            <p><strong>Analysis Date:</strong> """.encode("utf-8")
+
+SAMPLE_HTML_SUFFIX = """</p>
         </div>
 
         <div class="section-header">
@@ -204,10 +205,66 @@ def create_sample_html():
     </div>
 </body>
 </html>
-    """
+    """.encode("utf-8")
+
+# Inline tags kept in table cells; reportlab Paragraphs understand these
+PARAGRAPH_TAGS = {"b", "strong", "i", "em", "u"}
+
+class HTMLTableParser(HTMLParser):
+    """Collect the rows of the first <table> as lists of Paragraph-ready cell markup."""
+    
+    def __init__(self):
+        super().__init__()
+        self.rows = []
+        self.cell = None
+        self.done = False
+    
+    def handle_starttag(self, tag, attrs):
+        if self.done:
+            return
+        if tag == "tr":
+            self.rows.append([])
+        elif tag in ("td", "th") and self.rows:
+            self.cell = []
+        elif tag in PARAGRAPH_TAGS and self.cell is not None:
+            self.cell.append(f"<{tag}>")
+    
+    def handle_endtag(self, tag):
+        if self.done:
+            return
+        if tag in ("td", "th") and self.cell is not None:
+            self.rows[-1].append("".join(self.cell).strip())
+            self.cell = None
+        elif tag in PARAGRAPH_TAGS and self.cell is not None:
+            self.cell.append(f"</{tag}>")
+        elif tag == "table":
+            self.done = True
+    
+    def handle_data(self, data):
+        if self.cell is not None:
+            self.cell.append(escape(data, quote=False))
+
+def read_html_table(html_path):
+    """Return the first table of an HTML file as rows of cell markup."""
+    parser = HTMLTableParser()
+    with open(html_path, 'r', encoding='utf-8') as f:
+        parser.feed(f.read())
+    parser.close()
+    return parser.rows
+
+def create_sample_html():
+    """Create a sample HTML file similar to the underwriting template."""
+    timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+    html_path = f"outputs/Sample_Package_{timestamp}.html"
+    
+    os.makedirs("outputs", exist_ok=True)
     
-    with open(html_path, 'w', encoding='utf-8') as f:
-        f.write(html_content)
+    # Static markup is pre-encoded at import; only the analysis date is encoded per call
+    Path(html_path).write_bytes(b"".join((
+        SAMPLE_HTML_PREFIX,
+        datetime.now().strftime('%B %d, %Y').encode("utf-8"),
+        SAMPLE_HTML_SUFFIX
+    )))
     
     print(f"✅ Sample HTML created: {html_path}")
     return html_path
@@ -232,7 +289,7 @@ def convert_to_pdf(html_path):
     try:
         from reportlab.lib.pagesizes import letter, A4
         from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Table, TableStyle
-        from reportlab.lib.styles import getSampleStyleSheet
+        from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
         from reportlab.lib import colors
         from reportlab.lib.units import inch
         
@@ -262,33 +319,24 @@ def convert_to_pdf(html_path):
         # Financial table
         story.append(Paragraph("<b>Financial Summary</b>", styles['Heading2']))
         
+        # The table comes from the generated HTML, so both outputs share one source
+        header_style = ParagraphStyle('TableHeader', parent=styles['Normal'], fontName='Helvetica-Bold',
+                                      fontSize=10, leading=12, textColor=colors.whitesmoke)
+        cell_style = ParagraphStyle('TableCell', parent=styles['Normal'], fontSize=8, leading=10)
+        html_rows = read_html_table(html_path)
         table_data = [
-            ['Line Item', 'Amount', '% of EGI', 'Notes'],
-            ['Gross Potential Income', '$1,204,800', '104.5%', 'Based on rent roll analysis'],
-            ['Vacancy Loss', '($60,240)', '(5.2%)', 'Applied 5% vacancy rate'],
-            ['Other Income', '$12,048', '1.0%', 'Laundry and fees'],
-            ['Effective Gross Income', '$1,156,608', '100.0%', 'Total income after vacancy'],
-            ['Property Taxes', '$92,529', '8.0%', 'Based on assessment'],
-            ['Insurance', '$23,132', '2.0%', 'Property insurance'],
-            ['Utilities', '$34,698', '3.0%', 'Common area utilities'],
-            ['Repairs & Maintenance', '$57,830', '5.0%', 'Ongoing maintenance'],
-            ['Management Fee', '$28,915', '2.5%', 'Professional management'],
-            ['Other Expenses', '$46,264', '4.0%', 'Administrative costs'],
-            ['Total Operating Expenses', '$283,368', '24.5%', 'Total expenses'],
-            ['Net Operating Income', '$873,240', '75.5%', 'Final NOI']
+            [Paragraph(cell, header_style if row_index == 0 else cell_style) for cell in row]
+            for row_index, row in enumerate(html_rows)
         ]
         
         table = Table(table_data, colWidths=[2.5*inch, 1*inch, 0.8*inch, 2*inch])
         table.setStyle(TableStyle([
             ('BACKGROUND', (0, 0), (-1, 0), colors.grey),
-            ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
             ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
-            ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-            ('FONTSIZE', (0, 0), (-1, 0), 10),
+            ('VALIGN', (0, 0), (-1, -1), 'TOP'),
             ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
             ('BACKGROUND', (0, 1), (-1, -1), colors.beige),
             ('GRID', (0, 0), (-1, -1), 1, colors.black),
-            ('FONTSIZE', (0, 1), (-1, -1), 8),
         ]))
         
         story.append(table)
@@ -337,7 +385,7 @@ def create_sample_csv():
         ['203', '1BR/1BA', '650', '1050', '1150', 'Taylor, Chris', '2025-07-15', 'Occupied']
     ]
     
-    with open(rent_roll_csv, 'w', newline='', encoding='utf-8') as f:
+    with open(rent_roll_csv, 'w', newline='', encoding='utf-8', buffering=CSV_BUFFER_SIZE) as f:
         writer = csv.writer(f)
         writer.writerows(rent_roll_data)
     
@@ -359,7 +407,7 @@ def create_sample_csv():
         ['Net Operating Income', '80520', '81517', '82492', '84357', '85294', '85835', '85341', '86675', '85571', '85392', '84911', '82747', '1011352']
     ]
     
-    with open(t12_csv, 'w', newline='', encoding='utf-8') as f:
+    with open(t12_csv, 'w', newline='', encoding='utf-8', buffering=CSV_BUFFER_SIZE) as f:
         writer = csv.writer(f)
         writer.writerows(t12_data)
     
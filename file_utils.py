@@ -0,0 +1,25 @@
+#!/usr/bin/env python3
+"""
+File Utilities
+Small filesystem helpers shared by the apps and the command-line scripts.
+"""
+
+import os
+import shutil
+
+def link_or_copy(src, dst):
+    """Hard-link src to dst (copying when linking isn't possible, e.g. across filesystems).
+    
+    An existing dst is replaced atomically.
+    """
+    tmp_path = f"{dst}.{os.getpid()}.tmp"
+    try:
+        os.link(src, tmp_path)
+    except FileNotFoundError:
+        raise
+    except OSError:
+        shutil.copyfile(src, tmp_path)
+    os.replace(tmp_path, dst)
+    # rename() leaves both names in place when they already point at the same file
+    if os.path.lexists(tmp_path):
+        os.remove(tmp_path)
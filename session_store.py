@@ -0,0 +1,169 @@
+#!/usr/bin/env python3
+"""
+Session Store
+Processing-session storage for the FastAPI apps. Sessions are kept in a
+process-local dict by default, or in Redis (one hash per session) when a
+REDIS_URL is configured so that several uvicorn workers share the same sessions.
+
+The read/write methods are coroutines: in Redis mode they go through a redis.asyncio
+client so a round trip never blocks the event loop. get_sync() is for worker threads.
+"""
+
+import threading
+from dataclasses import asdict
+
+import msgspec
+
+def encode_fallback(value):
+    """msgspec hook for values in results that aren't plain JSON types (e.g. numpy scalars)."""
+    if hasattr(value, "item"):
+        return value.item()
+    return str(value)
+
+# Fast JSON encoder for session records and results: used for every status poll and push,
+# and for the fields stored in Redis, so both modes hand clients the same JSON
+status_encoder = msgspec.json.Encoder(enc_hook=encode_fallback)
+field_decoder = msgspec.json.Decoder()
+
+SESSION_KEY_PREFIX = "sess:"
+SESSION_TTL_SECONDS = 24 * 60 * 60  # Redis sessions expire after a day
+REDIS_CONNECT_TIMEOUT_SECONDS = 2  # An unreachable REDIS_URL falls back to memory instead of hanging startup
+
+# Partial update in one round trip: skip sessions that no longer exist, otherwise
+# HSET the fields, refresh the TTL and publish a change notification on the key's channel
+UPDATE_FIELDS_SCRIPT = """
+if redis.call('EXISTS', KEYS[1]) == 0 then
+    return 0
+end
+redis.call('HSET', KEYS[1], unpack(ARGV, 2))
+redis.call('EXPIRE', KEYS[1], ARGV[1])
+redis.call('PUBLISH', KEYS[1], '1')
+return 1
+"""
+
+class SessionStore:
+    """Store of session dataclass records, optionally backed by Redis."""
+
+    def __init__(self, model, redis_url=None, ttl=SESSION_TTL_SECONDS):
+        self.model = model
+        self.ttl = ttl
+        # In-memory mode: one dict behind one lock. Handlers and background tasks all run
+        # on the event loop and the cleanup thread only reads, so there is nothing to
+        # spread out; the lock keeps update()'s read-modify-write whole if a thread writes
+        self._sessions = {}
+        self._lock = threading.Lock()
+        self.redis = None  # Blocking client: connection check and get_sync() from threads
+        self.redis_url = redis_url
+        self._async_redis = None  # Everything called from the event loop
+        self.on_change = None  # Optional callback(session_id) fired after every write or delete
+
+        if redis_url:
+            try:
+                import redis
+                import redis.asyncio
+                client = redis.Redis.from_url(redis_url, socket_connect_timeout=REDIS_CONNECT_TIMEOUT_SECONDS)
+                client.ping()
+                self.redis = client
+                self._async_redis = redis.asyncio.Redis.from_url(
+                    redis_url, socket_connect_timeout=REDIS_CONNECT_TIMEOUT_SECONDS
+                )
+                self._update_fields = self._async_redis.register_script(UPDATE_FIELDS_SCRIPT)
+                print("✅ Session store connected to Redis")
+            except ImportError:
+                print("⚠️ redis package not available - using in-memory sessions")
+            except Exception as e:
+                print(f"⚠️ Redis connection failed: {e} - using in-memory sessions")
+
+    def _notify(self, session_id):
+        if self.on_change is not None:
+            self.on_change(session_id)
+
+    def _key(self, session_id):
+        return f"{SESSION_KEY_PREFIX}{session_id}"
+
+    def _encode_fields(self, fields):
+        # numpy scalars become native numbers; other non-JSON values (datetimes, paths)
+        # their JSON strings, exactly as the status endpoints would send them
+        return {name: status_encoder.encode(value) for name, value in fields.items()}
+
+    def _decode(self, raw):
+        data = {name.decode(): field_decoder.decode(value) for name, value in raw.items()}
+        return self.model(**data)
+
+    async def exists(self, session_id):
+        """Return True when the session exists."""
+        if self.redis is None:
+            return session_id in self._sessions
+        return bool(await self._async_redis.exists(self._key(session_id)))
+
+    async def get(self, session_id, default=None):
+        """Return the session, or default when it doesn't exist (one HGETALL in Redis mode)."""
+        if self.redis is None:
+            return self._sessions.get(session_id, default)
+        raw = await self._async_redis.hgetall(self._key(session_id))
+        return self._decode(raw) if raw else default
+
+    def get_sync(self, session_id, default=None):
+        """Blocking get() for worker threads, which have no event loop to await on."""
+        if self.redis is None:
+            return self._sessions.get(session_id, default)
+        raw = self.redis.hgetall(self._key(session_id))
+        return self._decode(raw) if raw else default
+
+    async def save(self, session):
+        """Store a whole session: a new one, or one whose fields were changed in place."""
+        session_id = session.session_id
+        if self.redis is None:
+            with self._lock:
+                self._sessions[session_id] = session
+        else:
+            # HSET the fields, refresh the TTL and publish the change in one round trip
+            key = self._key(session_id)
+            async with self._async_redis.pipeline(transaction=False) as pipe:
+                pipe.hset(key, mapping=self._encode_fields(asdict(session)))
+                pipe.expire(key, self.ttl)
+                pipe.publish(key, 1)
+                await pipe.execute()
+        self._notify(session_id)
+
+    async def update(self, session_id, **fields):
+        """Update only the given fields of a session (HSET in Redis mode)."""
+        if self.redis is None:
+            with self._lock:
+                session = self._sessions.get(session_id)
+                if session is None:
+                    return
+                for name, value in fields.items():
+                    setattr(session, name, value)
+        else:
+            args = [self.ttl]
+            for name, value in self._encode_fields(fields).items():
+                args.extend((name, value))
+            if not await self._update_fields(keys=[self._key(session_id)], args=args):
+                return
+        self._notify(session_id)
+
+    async def delete(self, session_id):
+        """Remove a session; returns False when it didn't exist."""
+        if self.redis is None:
+            with self._lock:
+                if self._sessions.pop(session_id, None) is None:
+                    return False
+        else:
+            key = self._key(session_id)
+            if not await self._async_redis.delete(key):
+                return False
+            await self._async_redis.publish(key, 1)
+        self._notify(session_id)
+        return True
+
+    async def subscribe(self, session_id):
+        """Subscribe to change notifications published by any worker (Redis mode only).
+
+        Returns a redis.asyncio PubSub, or None when sessions are in memory.
+        """
+        if self.redis is None:
+            return None
+        pubsub = self._async_redis.pubsub()
+        await pubsub.subscribe(self._key(session_id))
+        return pubsub
@@ -0,0 +1,147 @@
+#!/usr/bin/env python3
+"""
+Tests for app_demo_fixed helpers: status encoding, the PDF render cache, the extracted
+table cache, download headers and address parsing.
+Run from the repository root, like the app itself.
+"""
+
+import json
+import os
+import tempfile
+import time
+from datetime import datetime
+
+import numpy as np
+
+# The app mounts ./static at import time
+os.makedirs("static", exist_ok=True)
+
+import app_demo_fixed
+from app_demo_fixed import ProcessingStatusRecord, extract_city_state_zip, status_encoder
+
+def test_extract_city_state_zip():
+    """City, state and zip come from the last two comma-separated fields, whitespace normalized."""
+    assert extract_city_state_zip("Atlanta,  GA 30309") == "Atlanta, GA 30309"
+    assert extract_city_state_zip("3350 Mount Gilead Rd, Atlanta, GA 30311") == "Atlanta, GA 30311"
+    assert extract_city_state_zip("Suite 4, 10 Main St, Austin , TX 78701") == "Austin, TX 78701"
+    assert extract_city_state_zip("No commas here") == "No commas here"
+
+def test_status_encoding():
+    """Status records encode to the JSON the page expects, numpy scalars included."""
+    record = ProcessingStatusRecord(
+        session_id="abc",
+        status="completed",
+        current_step=7,
+        total_steps=7,
+        step_name="Complete",
+        progress_percentage=100.0,
+        message="Done",
+        results={"noi": np.float64(125000.5), "units": np.int64(48), "generated": datetime(2024, 1, 2, 3, 4, 5)}
+    )
+    decoded = json.loads(status_encoder.encode(record))
+
+    assert decoded == {
+        "session_id": "abc",
+        "status": "completed",
+        "current_step": 7,
+        "total_steps": 7,
+        "step_name": "Complete",
+        "progress_percentage": 100.0,
+        "message": "Done",
+        "results": {"noi": 125000.5, "units": 48, "generated": "2024-01-02T03:04:05"},
+        "error_message": None
+    }
+
+class TemporaryPdfCache:
+    """Point the app's PDF cache at a temporary directory with the given size budget."""
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+
+    def __enter__(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.saved = (app_demo_fixed.PDF_CACHE_DIR, app_demo_fixed.PDF_CACHE_MAX_BYTES)
+        app_demo_fixed.PDF_CACHE_DIR = os.path.join(self.directory.name, "cache")
+        app_demo_fixed.PDF_CACHE_MAX_BYTES = self.max_bytes
+        return self.directory.name
+
+    def __exit__(self, *exc_info):
+        app_demo_fixed.PDF_CACHE_DIR, app_demo_fixed.PDF_CACHE_MAX_BYTES = self.saved
+        self.directory.cleanup()
+
+def test_pdf_cache_store_and_load():
+    """A stored render is placed back at a new path on a hit; a miss returns False."""
+    with TemporaryPdfCache(max_bytes=1024 * 1024) as directory:
+        pdf_path = os.path.join(directory, "report.pdf")
+        with open(pdf_path, "wb") as f:
+            f.write(b"not really a pdf")
+        cache_path = os.path.join(app_demo_fixed.PDF_CACHE_DIR, "digest.pdf")
+        app_demo_fixed.store_cached_pdf(pdf_path, cache_path)
+
+        reused_path = os.path.join(directory, "reused.pdf")
+        assert app_demo_fixed.load_cached_pdf(cache_path, reused_path)
+        with open(reused_path, "rb") as f:
+            assert f.read() == b"not really a pdf"
+
+        missing_path = os.path.join(app_demo_fixed.PDF_CACHE_DIR, "missing.pdf")
+        assert not app_demo_fixed.load_cached_pdf(missing_path, os.path.join(directory, "other.pdf"))
+        assert not os.path.exists(os.path.join(directory, "other.pdf"))
+
+def test_pdf_cache_prunes_least_recently_used():
+    """Entries used longest ago are evicted until the cache fits its budget."""
+    with TemporaryPdfCache(max_bytes=250):
+        os.makedirs(app_demo_fixed.PDF_CACHE_DIR)
+        now = time.time()
+        for age, name in ((300, "oldest"), (200, "older"), (100, "newer"), (0, "newest")):
+            path = os.path.join(app_demo_fixed.PDF_CACHE_DIR, f"{name}.pdf")
+            with open(path, "wb") as f:
+                f.write(b"x" * 100)
+            os.utime(path, (now - age, now - age))
+        app_demo_fixed.prune_pdf_cache()
+
+        assert sorted(os.listdir(app_demo_fixed.PDF_CACHE_DIR)) == ["newer.pdf", "newest.pdf"]
+
+def test_pdf_cache_prune_without_cache_dir():
+    """Pruning a cache directory that doesn't exist (yet) is not an error."""
+    with TemporaryPdfCache(max_bytes=0):
+        app_demo_fixed.prune_pdf_cache()
+
+def test_extracted_tables_evict_least_recently_used():
+    """Only the most recently used sessions keep their tables in memory."""
+    saved = (app_demo_fixed.EXTRACTED_TABLES_MAX_SESSIONS, app_demo_fixed.extracted_tables.copy())
+    app_demo_fixed.EXTRACTED_TABLES_MAX_SESSIONS = 2
+    app_demo_fixed.extracted_tables.clear()
+    try:
+        for session_id in ("a", "b"):
+            app_demo_fixed.remember_tables(session_id, {"rent_roll": session_id})
+        app_demo_fixed.extracted_tables.move_to_end("a")
+        app_demo_fixed.remember_tables("c", {"t12": "c"})
+
+        assert list(app_demo_fixed.extracted_tables) == ["a", "c"]
+    finally:
+        app_demo_fixed.EXTRACTED_TABLES_MAX_SESSIONS = saved[0]
+        app_demo_fixed.extracted_tables.clear()
+        app_demo_fixed.extracted_tables.update(saved[1])
+
+def test_attachment_disposition():
+    """Quotes and non-latin-1 names can't break the header; the exact name goes in filename*."""
+    header = app_demo_fixed.attachment_disposition('Café "Q" Apts_RentRoll.csv')
+    assert header == (
+        'attachment; filename="Caf___Q__Apts_RentRoll.csv"; '
+        "filename*=UTF-8''Caf%C3%A9%20%22Q%22%20Apts_RentRoll.csv"
+    )
+    header.encode("latin-1")
+
+    assert app_demo_fixed.attachment_disposition("Oak_T12.csv") == (
+        'attachment; filename="Oak_T12.csv"; filename*=UTF-8\'\'Oak_T12.csv'
+    )
+
+if __name__ == "__main__":
+    print("🚀 app_demo_fixed Helper Tests")
+    print("=" * 50)
+
+    for name, test in list(globals().items()):
+        if name.startswith("test_") and callable(test):
+            test()
+            print(f"✅ {name}")
+
+    print(f"\n✅ Test completed!")
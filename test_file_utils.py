@@ -0,0 +1,79 @@
+#!/usr/bin/env python3
+"""
+Tests for the shared file helpers.
+"""
+
+import os
+import tempfile
+
+from file_utils import link_or_copy
+
+def write(path, data):
+    with open(path, "wb") as f:
+        f.write(data)
+
+def read(path):
+    with open(path, "rb") as f:
+        return f.read()
+
+def test_link_new_file():
+    """A new destination shares the source's contents (and inode when linking works)."""
+    with tempfile.TemporaryDirectory() as directory:
+        src = os.path.join(directory, "src.pdf")
+        dst = os.path.join(directory, "dst.pdf")
+        write(src, b"report")
+        link_or_copy(src, dst)
+
+        assert read(dst) == b"report"
+        assert os.path.samefile(src, dst)
+        assert sorted(os.listdir(directory)) == ["dst.pdf", "src.pdf"]
+
+def test_replace_existing_file():
+    """An existing destination is replaced and no temporary file is left behind."""
+    with tempfile.TemporaryDirectory() as directory:
+        src = os.path.join(directory, "src.pdf")
+        dst = os.path.join(directory, "dst.pdf")
+        write(src, b"new")
+        write(dst, b"old")
+        link_or_copy(src, dst)
+
+        assert read(dst) == b"new"
+        assert sorted(os.listdir(directory)) == ["dst.pdf", "src.pdf"]
+
+def test_relink_same_file():
+    """Linking onto a name that already points at the source is a no-op."""
+    with tempfile.TemporaryDirectory() as directory:
+        src = os.path.join(directory, "src.pdf")
+        dst = os.path.join(directory, "dst.pdf")
+        write(src, b"report")
+        link_or_copy(src, dst)
+        link_or_copy(src, dst)
+
+        assert read(dst) == b"report"
+        assert sorted(os.listdir(directory)) == ["dst.pdf", "src.pdf"]
+
+def test_missing_source():
+    """A missing source raises FileNotFoundError and leaves the destination untouched."""
+    with tempfile.TemporaryDirectory() as directory:
+        dst = os.path.join(directory, "dst.pdf")
+        write(dst, b"old")
+        try:
+            link_or_copy(os.path.join(directory, "missing.pdf"), dst)
+        except FileNotFoundError:
+            pass
+        else:
+            raise AssertionError("expected FileNotFoundError")
+
+        assert read(dst) == b"old"
+        assert os.listdir(directory) == ["dst.pdf"]
+
+if __name__ == "__main__":
+    print("🚀 File Utilities Tests")
+    print("=" * 50)
+
+    for name, test in list(globals().items()):
+        if name.startswith("test_") and callable(test):
+            test()
+            print(f"✅ {name}")
+
+    print(f"\n✅ Test completed!")
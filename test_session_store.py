@@ -0,0 +1,171 @@
+#!/usr/bin/env python3
+"""
+Tests for the session store.
+Covers the in-memory mode used when no REDIS_URL is configured, and Redis mode against
+an in-process fakeredis server when fakeredis is installed.
+"""
+
+import asyncio
+from dataclasses import dataclass
+from datetime import datetime
+from pathlib import Path
+from typing import Optional
+
+import msgspec
+import numpy as np
+
+from session_store import SessionStore, status_encoder
+
+try:
+    import fakeredis
+    import redis
+    import redis.asyncio
+except ImportError:
+    fakeredis = None
+
+@dataclass
+class SampleSession:
+    session_id: str
+    status: str = "waiting"
+    current_step: int = 0
+    results: Optional[dict] = None
+
+def make_store():
+    """Return an in-memory store and the list of session ids it reported as changed."""
+    store = SessionStore(SampleSession)
+    changes = []
+    store.on_change = changes.append
+    return store, changes
+
+def test_save_and_get():
+    """Stored sessions come back as the same object; missing ones give the default."""
+    async def run():
+        store, changes = make_store()
+        session = SampleSession("abc")
+        await store.save(session)
+
+        assert await store.exists("abc")
+        assert await store.get("abc") is session
+        assert store.get_sync("abc") is session
+        assert await store.get("missing") is None
+        assert await store.get("missing", "default") == "default"
+        assert not await store.exists("missing")
+        assert changes == ["abc"]
+    asyncio.run(run())
+
+def test_save_after_in_place_change():
+    """save() stores the session under its own id and reports every write."""
+    async def run():
+        store, changes = make_store()
+        session = SampleSession("abc")
+        await store.save(session)
+        session.status = "processing"
+        await store.save(session)
+
+        assert (await store.get("abc")).status == "processing"
+        assert changes == ["abc", "abc"]
+    asyncio.run(run())
+
+def test_update_fields():
+    """update() changes only the given fields and skips sessions that don't exist."""
+    async def run():
+        store, changes = make_store()
+        await store.save(SampleSession("abc"))
+        await store.update("abc", status="completed", current_step=7)
+        await store.update("missing", status="completed")
+
+        session = await store.get("abc")
+        assert (session.status, session.current_step) == ("completed", 7)
+        assert not await store.exists("missing")
+        assert changes == ["abc", "abc"]
+    asyncio.run(run())
+
+def test_delete_notifies():
+    """Deleting a session removes it and reports the change so watchers can stop."""
+    async def run():
+        store, changes = make_store()
+        await store.save(SampleSession("abc"))
+
+        assert await store.delete("abc")
+        assert not await store.exists("abc")
+        assert await store.get("abc") is None
+        assert changes == ["abc", "abc"]
+
+        assert not await store.delete("abc")
+        assert changes == ["abc", "abc"]
+    asyncio.run(run())
+
+def test_sessions_are_independent():
+    """Many sessions can be stored side by side without affecting each other."""
+    async def run():
+        store, _ = make_store()
+        for i in range(100):
+            await store.save(SampleSession(f"s{i}", current_step=i))
+        await store.delete("s50")
+
+        assert not await store.exists("s50")
+        for i in range(100):
+            if i != 50:
+                assert (await store.get(f"s{i}")).current_step == i
+    asyncio.run(run())
+
+def make_redis_store():
+    """Return a Redis-mode store on a fresh fake server, and the list of changes it reported."""
+    server = fakeredis.FakeServer()
+    originals = (redis.Redis.from_url, redis.asyncio.Redis.from_url)
+    redis.Redis.from_url = lambda url, **kwargs: fakeredis.FakeRedis(server=server)
+    redis.asyncio.Redis.from_url = lambda url, **kwargs: fakeredis.FakeAsyncRedis(server=server)
+    try:
+        store = SessionStore(SampleSession, redis_url="redis://fake")
+    finally:
+        redis.Redis.from_url, redis.asyncio.Redis.from_url = originals
+    assert store.redis is not None
+    changes = []
+    store.on_change = changes.append
+    return store, changes
+
+def test_redis_round_trip_matches_memory_mode():
+    """Sessions read back from Redis hold the same JSON values the status endpoints send."""
+    if fakeredis is None:
+        print("⚠️ fakeredis not installed - skipping Redis-mode test")
+        return
+
+    results = {
+        "noi": np.float64(125000.5),
+        "units": np.int64(48),
+        "flags": [np.int32(1), "review"],
+        "generated": datetime(2024, 1, 2, 3, 4, 5),
+        "pdf_path": Path("outputs/report.pdf")
+    }
+
+    async def run():
+        store, changes = make_redis_store()
+        await store.save(SampleSession("abc", results=results))
+        await store.update("abc", status="completed", current_step=np.int64(7))
+
+        session = await store.get("abc")
+        memory_json = msgspec.json.decode(status_encoder.encode(SampleSession("abc", "completed", 7, results)))
+        assert msgspec.json.decode(status_encoder.encode(session)) == memory_json
+        assert session.results["units"] == 48 and type(session.results["units"]) is int
+        assert type(session.results["noi"]) is float
+        assert type(session.current_step) is int
+        assert session.results["generated"] == "2024-01-02T03:04:05"
+        assert session.results["pdf_path"] == "outputs/report.pdf"
+        assert store.get_sync("abc") == session
+
+        assert await store.delete("abc")
+        assert await store.get("abc") is None
+        assert not await store.delete("abc")
+        assert changes == ["abc", "abc", "abc"]
+    asyncio.run(run())
+
+if __name__ == "__main__":
+    print("🚀 Session Store Tests")
+    print("=" * 50)
+
+    for name, test in list(globals().items()):
+        if name.startswith("test_") and callable(test):
+            test()
+            print(f"✅ {name}")
+
+    print(f"\n✅ Test completed!")
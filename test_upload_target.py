@@ -0,0 +1,122 @@
+#!/usr/bin/env python3
+"""
+Tests for the streaming upload target.
+Feeds multipart bodies through the parser in small chunks, as a slow client would send them.
+"""
+
+import asyncio
+import os
+import tempfile
+
+from streaming_form_data import StreamingFormDataParser
+from streaming_form_data.targets import ListTarget
+
+from upload_target import UploadedFilesTarget, invalid_file_types, safe_filename
+
+BOUNDARY = "testboundary"
+
+def multipart_body(fields, files):
+    """Build a multipart/form-data body from (name, value) fields and (filename, data) files."""
+    body = b""
+    for name, value in fields:
+        body += (
+            f"--{BOUNDARY}\r\nContent-Disposition: form-data; name=\"{name}\"\r\n\r\n{value}\r\n"
+        ).encode("utf-8")
+    for filename, data in files:
+        body += (
+            f"--{BOUNDARY}\r\nContent-Disposition: form-data; name=\"files\"; filename=\"{filename}\"\r\n"
+            "Content-Type: application/pdf\r\n\r\n"
+        ).encode("utf-8") + data + b"\r\n"
+    return body + f"--{BOUNDARY}--\r\n".encode("utf-8")
+
+def parse_upload(directory, body, chunk_size=7):
+    """Stream body through a parser into an UploadedFilesTarget; returns (target, file_types)."""
+    async def run():
+        files_target = UploadedFilesTarget(directory, buffer_size=16)
+        file_types_target = ListTarget(str)
+        parser = StreamingFormDataParser(headers={"Content-Type": f"multipart/form-data; boundary={BOUNDARY}"})
+        parser.register("file_types", file_types_target)
+        parser.register("files", files_target)
+        try:
+            for start in range(0, len(body), chunk_size):
+                await parser.adata_received(body[start:start + chunk_size])
+        finally:
+            receiving = files_target.receiving
+            await files_target.aclose()
+        return files_target, file_types_target.value, receiving
+    return asyncio.run(run())
+
+def test_files_are_staged_with_sizes():
+    """Each file part is written to a staged path prefixed with its part index."""
+    rent_roll = b"%PDF-1.4 rent roll" * 50
+    t12 = b"%PDF-1.4 t12"
+    body = multipart_body(
+        [("file_types", "rent_roll"), ("file_types", "t12")],
+        [("rr.pdf", rent_roll), ("t12.pdf", t12)]
+    )
+    with tempfile.TemporaryDirectory() as directory:
+        target, file_types, receiving = parse_upload(directory, body)
+
+        assert not receiving
+        assert file_types == ["rent_roll", "t12"]
+        assert [(index, name) for index, _, name in target.saved_files] == [(0, "rr.pdf"), (1, "t12.pdf")]
+        for (_, staged_path, _), data in zip(target.saved_files, (rent_roll, t12)):
+            assert os.path.dirname(staged_path) == directory
+            assert os.path.basename(staged_path).startswith(".")
+            with open(staged_path, "rb") as f:
+                assert f.read() == data
+            assert target.file_sizes[staged_path] == len(data)
+
+def test_duplicate_names_do_not_collide():
+    """Two parts with the same filename are staged separately."""
+    body = multipart_body([], [("same.pdf", b"first"), ("same.pdf", b"second")])
+    with tempfile.TemporaryDirectory() as directory:
+        target, _, _ = parse_upload(directory, body)
+
+        contents = []
+        for _, staged_path, _ in target.saved_files:
+            with open(staged_path, "rb") as f:
+                contents.append(f.read())
+        assert contents == [b"first", b"second"]
+
+def test_client_paths_are_stripped():
+    """Directory parts of client filenames never reach the filesystem."""
+    body = multipart_body([], [("../../escape.pdf", b"a"), ("C:\\\\Users\\\\me\\\\win.pdf", b"b")])
+    with tempfile.TemporaryDirectory() as directory:
+        target, _, _ = parse_upload(directory, body)
+
+        assert [name for _, _, name in target.saved_files] == ["escape.pdf", "win.pdf"]
+        assert sorted(os.listdir(directory)) == [".0_escape.pdf", ".1_win.pdf"]
+
+def test_truncated_body_leaves_file_open_until_closed():
+    """A body that stops mid-file is reported as still receiving; aclose() closes the handle."""
+    body = multipart_body([], [("big.pdf", b"x" * 1000)])[:-300]
+    with tempfile.TemporaryDirectory() as directory:
+        target, _, receiving = parse_upload(directory, body)
+
+        assert receiving
+        assert not target.receiving
+
+def test_safe_filename():
+    """Only a bare file name survives; empty or dot names use the fallback."""
+    assert safe_filename("report.pdf", "file_0") == "report.pdf"
+    assert safe_filename("a/b/report.pdf", "file_0") == "report.pdf"
+    assert safe_filename("a\\b\\report.pdf", "file_0") == "report.pdf"
+    assert safe_filename("..", "file_0") == "file_0"
+    assert safe_filename("dir/", "file_3") == "file_3"
+
+def test_invalid_file_types():
+    """Known document categories pass; anything else is reported once, sorted."""
+    assert invalid_file_types(["rent_roll", "t12", "additional"]) == []
+    assert invalid_file_types(["t12", "../etc", "other", "other"]) == ["../etc", "other"]
+
+if __name__ == "__main__":
+    print("🚀 Upload Target Tests")
+    print("=" * 50)
+
+    for name, test in list(globals().items()):
+        if name.startswith("test_") and callable(test):
+            test()
+            print(f"✅ {name}")
+
+    print(f"\n✅ Test completed!")
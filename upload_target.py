@@ -0,0 +1,70 @@
+#!/usr/bin/env python3
+"""
+Upload Target
+Streaming multipart upload handling shared by the FastAPI apps. Uploaded files are
+written straight into the session directory while the request body is parsed.
+"""
+
+import os
+
+import aiofiles
+from streaming_form_data.targets import BaseTarget
+
+# Document categories the processors know about; each one gets its own session subdirectory
+UPLOAD_FILE_TYPES = ("rent_roll", "t12", "additional")
+
+def safe_filename(filename, fallback):
+    """Reduce a client-supplied filename to a bare name that can't leave its directory."""
+    name = os.path.basename(filename.replace("\\", "/"))
+    if name in ("", ".", ".."):
+        return fallback
+    return name
+
+def invalid_file_types(file_types):
+    """Return the file types that aren't one of UPLOAD_FILE_TYPES."""
+    return sorted(set(file_types) - set(UPLOAD_FILE_TYPES))
+
+class UploadedFilesTarget(BaseTarget):
+    """Multipart target that streams every uploaded file straight into the session directory."""
+    def __init__(self, directory, buffer_size=1024 * 1024):
+        super().__init__()
+        self.directory = directory
+        self.buffer_size = buffer_size
+        self.saved_files = []  # (part_index, staged_path, original_filename) per non-empty file
+        self.file_sizes = {}  # staged_path -> bytes written
+        self.part_count = 0
+        self._fd = None
+        self._staged_path = None
+
+    @property
+    def receiving(self):
+        """True while a file part has been started but not finished."""
+        return self._fd is not None
+
+    async def on_start_async(self):
+        part_index = self.part_count
+        self.part_count += 1
+        if not self.multipart_filename:
+            return
+        # Keep only the base name and prefix the part index so duplicate names can't collide
+        filename = safe_filename(self.multipart_filename, f"file_{part_index}")
+        staged_path = os.path.join(self.directory, f".{part_index}_{filename}")
+        self.saved_files.append((part_index, staged_path, filename))
+        self.file_sizes[staged_path] = 0
+        self._staged_path = staged_path
+        self._fd = await aiofiles.open(staged_path, "wb", buffering=self.buffer_size)
+
+    async def on_data_received_async(self, chunk: bytes):
+        if self._fd:
+            await self._fd.write(chunk)
+            self.file_sizes[self._staged_path] += len(chunk)
+
+    async def on_finish_async(self):
+        await self.aclose()
+
+    async def aclose(self):
+        """Close the file being written, if any; safe to call more than once."""
+        if self._fd:
+            fd, self._fd = self._fd, None
+            await fd.close()
+